@@ -0,0 +1,128 @@
+import argparse
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from game import Game
+from trajectories import Trajectories
+from roles import RoleTimeline
+import proximity
+import encounters
+import kinematics
+import instrumentation
+
+# a runaway closer than this to a hunter counts as being near a hunter, same
+# default as find_interesting_events.py
+RADIUS_METERS = 50
+
+SUMMARY_PATH = "summary.parquet"
+
+
+def summarize_game(game_name, radius_meters=RADIUS_METERS, speed_windows_ms=kinematics.SPEED_WINDOWS_MS):
+    # One row per team of a game. Trajectory based values cover the running
+    # interval of the game (or the whole grid if it never ran) and are
+    # missing if there is neither a trajectory store nor interpol.parquet.
+    with instrumentation.stage("summarize_game", game_name) as record:
+        game = Game.load(game_name)
+        running_interval = game.running_interval()
+        catch_times = game.catch_times()
+        initial_hunter = game.initial_hunter()
+        display_names = dict(zip(game.users.tolist(), game.user_names.tolist()))
+        rows = {
+            team_name: {
+                "game": game_name,
+                "team": team_name,
+                "name": display_names.get(team_name, ""),
+                "initial_hunter": team_name == initial_hunter,
+                "catch_time": catch_times[team_name] if team_name != initial_hunter and team_name in catch_times else None,
+                "running_start": running_interval.get("start"),
+                "running_end": running_interval.get("end"),
+            }
+            for team_name in game.active_users()
+        }
+
+        trajectories = Trajectories.load(game_name)
+        if trajectories is not None:
+            if "start" in running_interval:
+                end = running_interval.get("end", int(trajectories.time[-1]) + trajectories.step)
+                trajectories = trajectories.window(running_interval["start"], end)
+            for team_name, values in summarize_trajectories(game, trajectories, radius_meters, speed_windows_ms).items():
+                rows.setdefault(team_name, {"game": game_name, "team": team_name, "name": display_names.get(team_name, "")}).update(values)
+        else:
+            print(f"{game_name}: no trajectory store or interpol.parquet, run interpolate.py first for distances, speeds and encounters")
+        record["rows"] = len(rows)
+    return list(rows.values())
+
+
+def summarize_trajectories(game, trajectories, radius_meters, speed_windows_ms):
+    teams = trajectories.team_names
+    hunter = RoleTimeline.from_game(game, teams).hunter_mask(trajectories.time)
+    lat = np.asarray(trajectories.lat)
+    lon = np.asarray(trajectories.lon)
+
+    # distance covered between two grid rows, in the role of the later row
+    covered = np.diff(trajectories.distance, axis=0)
+    hunting = hunter[1:]
+    step_seconds = trajectories.step / 1000
+    # rolling speeds in m/s, acceleration and moving time
+    with instrumentation.stage("kinematics", game.game_name):
+        motion = kinematics.summarize(trajectories.distance, trajectories.step, speed_windows_ms)
+
+    with instrumentation.stage("nearest_hunter_distance", game.game_name):
+        near = proximity.nearest_hunter_distance(lat, lon, hunter) < radius_meters
+    with instrumentation.stage("encounter_pairs", game.game_name):
+        x, y = encounters.project(lat, lon)
+        intervals = encounters.pair_intervals(trajectories.time, teams, *encounters.encounter_pairs(x, y, hunter, radius_meters))
+    as_runaway = Counter(interval["prey"] for interval in intervals)
+    as_hunter = Counter(interval["hunter"] for interval in intervals)
+
+    return {
+        team_name: {
+            "duration_s": len(trajectories.time) * trajectories.step / 1000,
+            "distance_m": float(np.nansum(covered[:, column])),
+            "runaway_distance_m": float(np.nansum(covered[~hunting[:, column], column])),
+            "hunter_distance_m": float(np.nansum(covered[hunting[:, column], column])),
+            "top_speed_mps": float(np.nanmax(covered[:, column], initial=0) / step_seconds),
+            **{name: float(values[column]) for name, values in motion.items()},
+            "near_hunter_s": int(near[:, column].sum()) * trajectories.step / 1000,
+            "encounters_as_runaway": as_runaway[team_name],
+            "encounters_as_hunter": as_hunter[team_name],
+        }
+        for column, team_name in enumerate(teams)
+    }
+
+
+def main(game_names, radius_meters=RADIUS_METERS, jobs=1, output=SUMMARY_PATH, speed_windows_ms=kinematics.SPEED_WINDOWS_MS):
+    # Map every game to its rows in worker processes, then reduce them into
+    # one table
+    arguments = (game_names, [radius_meters] * len(game_names), [speed_windows_ms] * len(game_names))
+    if jobs == 1:
+        results = list(map(summarize_game, *arguments))
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            results = list(executor.map(summarize_game, *arguments))
+    summary = pd.DataFrame([row for rows in results for row in rows])
+    # nullable integers, teams of games without a store have no encounters
+    for column in ["catch_time", "running_start", "running_end", "encounters_as_runaway", "encounters_as_hunter"]:
+        if column in summary:
+            summary[column] = summary[column].astype("Int64")
+    summary.to_parquet(output, index=False)
+    print(f"{len(summary)} teams of {len(game_names)} games written to {output}")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize every game in data/ into one parquet table with a row per team")
+    parser.add_argument("--game", nargs="+", default=None, help="game directories in data/, all by default")
+    parser.add_argument("--radius", type=float, default=RADIUS_METERS, help="runaway to hunter distance in meters that counts as near")
+    parser.add_argument("--speed-windows", type=int, nargs="+", default=[window_ms // 1000 for window_ms in kinematics.SPEED_WINDOWS_MS], help="rolling windows in seconds of the top speeds")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--output", default=SUMMARY_PATH, help="path of the summary table")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+    game_names = args.game if args.game is not None else sorted(os.listdir("data/"))
+    main(game_names, args.radius, args.jobs, args.output, [seconds * 1000 for seconds in args.speed_windows])
@@ -0,0 +1,108 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import fake_data
+import split_teams
+import interpolate
+import find_interesting_events
+import json_to_gpx
+from game import Game
+
+# synthetic game sizes the pipeline is measured at
+SCALES = {
+    "small": dict(num_teams=5, duration_s=1800, gps_interval_s=5.0),
+    "medium": dict(num_teams=20, duration_s=3600, gps_interval_s=2.0),
+    "large": dict(num_teams=50, duration_s=7200, gps_interval_s=1.0),
+}
+
+PARAMETERS = dict(time_step_ms=5_000, inactive_after_ms=30_000, average_speed_inteval_ms=60_000)
+
+
+def measure(stage, memory=True):
+    # Runs the stage once for the wall time and, if memory is set, once more
+    # under tracemalloc for the peak of python allocations
+    gc.collect()
+    start = time.perf_counter()
+    result = stage()
+    stats = {"wall_s": time.perf_counter() - start}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        stage()
+        stats["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, stats
+
+
+def benchmark_game(game_name, memory=True):
+    # Every stage of the conversion pipeline on data/<game_name>, in order
+    stages = dict()
+    time_step_ms = PARAMETERS["time_step_ms"]
+
+    _, stages["split_teams"] = measure(lambda: split_teams.split_game(game_name, force=True), memory)
+    (teams, raw_entries), stages["json_to_dataframe"] = measure(lambda: interpolate.load_game(game_name), memory)
+    trajectories, stages["consolidate_data"] = measure(lambda: interpolate.consolidate_data(teams, time_step_ms), memory)
+    _, stages["connection_status"] = measure(lambda: interpolate.connection_status(trajectories, teams, PARAMETERS["inactive_after_ms"]), memory)
+    _, stages["make_cumulative_distance"] = measure(lambda: interpolate.make_cumulative_distance(trajectories), memory)
+    num_points = PARAMETERS["average_speed_inteval_ms"] // time_step_ms
+    _, stages["make_average_speed"] = measure(lambda: interpolate.make_average_speed(trajectories, num_points), memory)
+    os.makedirs(f"data/{game_name}/log-interpol", exist_ok=True)
+    trajectories.interpol_dataframe().to_parquet(f"data/{game_name}/log-interpol/interpol.parquet")
+    trajectories.save(f"data/{game_name}/{interpolate.STORE_PATH}")
+    _, stages["write_interpol_json"] = measure(lambda: interpolate.write_interpol_json(game_name, trajectories, teams, raw_entries), memory)
+    # the later stages read the columnar Game from data/<game>/cache/, the
+    # export is parsed here on its own so that cost shows up in one stage
+    _, stages["parse_game"] = measure(lambda: Game.load(game_name, use_cache=False), memory)
+    Game.load(game_name)
+    _, stages["find_interesting_events"] = measure(lambda: find_interesting_events.find_interesting_timestamps(game_name), memory)
+    _, stages["json_to_gpx"] = measure(lambda: json_to_gpx.main([game_name]), memory)
+    return stages
+
+
+def main(scale_names, output, memory=True, baseline=None):
+    results = {"created": datetime.datetime.now(datetime.UTC).isoformat(), "parameters": PARAMETERS, "scales": []}
+    repository = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        # the pipeline works on data/ relative to the working directory
+        os.chdir(root)
+        try:
+            for scale_name in scale_names:
+                game_name = f"benchmark-{scale_name}"
+                num_entries = fake_data.generate_game(game_name, **SCALES[scale_name])
+                print(f"{scale_name}: {num_entries} status updates")
+                stages = benchmark_game(game_name, memory)
+                for stage, stats in stages.items():
+                    peak = f"{stats['peak_bytes'] / 2 ** 20:8.1f} MiB" if "peak_bytes" in stats else ""
+                    print(f"  {stage:<26} {stats['wall_s']:8.3f} s {peak}")
+                results["scales"].append({"name": scale_name, **SCALES[scale_name], "entries": num_entries, "stages": stages})
+        finally:
+            os.chdir(repository)
+
+    with open(output, "w") as file:
+        json.dump(results, file, indent=4)
+
+    if baseline is not None:
+        # wall time ratios against an earlier result file
+        with open(baseline) as file:
+            previous = {scale["name"]: scale["stages"] for scale in json.load(file)["scales"]}
+        for scale in results["scales"]:
+            for stage, stats in scale["stages"].items():
+                if stage in previous.get(scale["name"], {}):
+                    ratio = stats["wall_s"] / previous[scale["name"]][stage]["wall_s"]
+                    print(f"{scale['name']:<8} {stage:<26} x{ratio:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the conversion pipeline on synthetic games")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--output", default="benchmark.json", help="result file")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc runs")
+    parser.add_argument("--baseline", help="earlier result file to compare wall times against")
+    args = parser.parse_args()
+    main(args.scales, args.output, memory=not args.no_memory, baseline=args.baseline)
@@ -0,0 +1,41 @@
+import hashlib
+import json
+import os
+
+# Per game manifest that remembers which inputs and parameters every stage
+# was last built from, so unchanged games can be skipped on a rebuild
+MANIFEST_NAME = "build_manifest.json"
+
+
+def stage_hash(game_name, inputs, parameters):
+    # inputs are paths relative to the game directory
+    digest = hashlib.sha256()
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    for path in sorted(inputs):
+        digest.update(path.encode())
+        with open(f"data/{game_name}/{path}", "rb") as file:
+            while chunk := file.read(1 << 20):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(game_name):
+    try:
+        with open(f"data/{game_name}/{MANIFEST_NAME}") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return dict()
+
+
+def is_up_to_date(game_name, stage, digest):
+    entry = read_manifest(game_name).get(stage)
+    if entry is None or entry["hash"] != digest:
+        return False
+    return all(os.path.exists(f"data/{game_name}/{path}") for path in entry["outputs"])
+
+
+def record_stage(game_name, stage, digest, outputs):
+    manifest = read_manifest(game_name)
+    manifest[stage] = {"hash": digest, "outputs": sorted(outputs)}
+    with open(f"data/{game_name}/{MANIFEST_NAME}", "w") as file:
+        json.dump(manifest, file, indent=4)
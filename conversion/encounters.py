@@ -0,0 +1,99 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from proximity import EARTH_RADIUS_IN_METERS
+
+
+def project(lat, lon):
+    # Equirectangular projection to meters around the mean position, accurate
+    # enough for the extent of a single city
+    lat_0 = np.deg2rad(np.nanmean(lat))
+    lon_0 = np.deg2rad(np.nanmean(lon))
+    x = EARTH_RADIUS_IN_METERS * (np.deg2rad(lon) - lon_0) * np.cos(lat_0)
+    y = EARTH_RADIUS_IN_METERS * (np.deg2rad(lat) - lat_0)
+    return x, y
+
+
+def encounter_pairs(x, y, hunter, radius, nearest=False):
+    # All (time index, hunter column, prey column) triples with the prey
+    # within radius meters of the hunter. Builds one KD-tree over the hunters
+    # per time step instead of comparing every hunter with every prey. With
+    # nearest the same trees also give the (time, team) distance in meters to
+    # and column of the closest hunter for every prey, inf and -1 for hunters
+    # and while there is no hunter, returned after the triples.
+    time_indices = []
+    hunter_columns = []
+    prey_columns = []
+    distance = np.full(x.shape, np.inf) if nearest else None
+    column = np.full(x.shape, -1, dtype=np.int64) if nearest else None
+    for t in range(len(x)):
+        hunters = np.flatnonzero(hunter[t])
+        preys = np.flatnonzero(~hunter[t])
+        if len(hunters) == 0 or len(preys) == 0:
+            continue
+        tree = cKDTree(np.column_stack([x[t, hunters], y[t, hunters]]))
+        prey_points = np.column_stack([x[t, preys], y[t, preys]])
+        matches = tree.query_ball_point(prey_points, radius)
+        for prey, hunter_matches in zip(preys, matches):
+            for match in hunter_matches:
+                time_indices.append(t)
+                hunter_columns.append(hunters[match])
+                prey_columns.append(prey)
+        if nearest:
+            distance[t, preys], match = tree.query(prey_points)
+            column[t, preys] = hunters[match]
+    pairs = (
+        np.array(time_indices, dtype=np.int64),
+        np.array(hunter_columns, dtype=np.int64),
+        np.array(prey_columns, dtype=np.int64),
+    )
+    if nearest:
+        return pairs, distance, column
+    return pairs
+
+
+def closest_approaches(times, team_names, distance, column):
+    # For every team that was a prey at some time step, the closest any
+    # hunter came to it, from the nearest arrays of encounter_pairs
+    approaches = []
+    for prey in range(distance.shape[1]):
+        t = int(np.argmin(distance[:, prey]))
+        if not np.isfinite(distance[t, prey]):
+            continue
+        approaches.append({
+            "prey": team_names[prey],
+            "hunter": team_names[column[t, prey]],
+            "time": int(times[t]),
+            "distance": float(distance[t, prey]),
+        })
+    return approaches
+
+
+def pair_intervals(times, team_names, time_indices, hunter_columns, prey_columns):
+    # Groups encounter triples into intervals per hunter/prey pair. Like
+    # proximity.find_intervals an interval ends at the first time step the
+    # pair is apart again, or at the last time step.
+    times = np.asarray(times)
+    if len(time_indices) == 0:
+        return []
+    order = np.lexsort((time_indices, prey_columns, hunter_columns))
+    time_indices = time_indices[order]
+    hunter_columns = hunter_columns[order]
+    prey_columns = prey_columns[order]
+    starts_run = np.ones(len(order), dtype=bool)
+    starts_run[1:] = (
+        (hunter_columns[1:] != hunter_columns[:-1])
+        | (prey_columns[1:] != prey_columns[:-1])
+        | (time_indices[1:] != time_indices[:-1] + 1)
+    )
+    run_starts = np.flatnonzero(starts_run)
+    run_ends = np.append(run_starts[1:], len(order)) - 1
+    return [
+        {
+            "hunter": team_names[hunter_columns[start]],
+            "prey": team_names[prey_columns[start]],
+            "start": int(times[time_indices[start]]),
+            "end": int(times[min(time_indices[end] + 1, len(times) - 1)]),
+        }
+        for start, end in zip(run_starts.tolist(), run_ends.tolist())
+    ]
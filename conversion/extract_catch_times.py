@@ -1,25 +1,33 @@
-import json
+import argparse
 import datetime
 
-with open(
-    "data-by-game/hackaburg-campuswiese/log-export/regular_status_update.json"
-) as file:
-    data = json.load(file)
+import numpy as np
 
-hunter_times = {}
+from game import Game
 
-for entry in data:
-    if entry["team_role"] != "HUNTER":
-        continue
+# specify game
+GAME = "hackaburg-campuswiese"
 
-    user = entry["active_user"]
-    if user not in hunter_times:
-        hunter_times[user] = []
 
-    hunter_times[user].append(entry["current_location"]["timestamp"])
+def main(game_name):
+    game = Game.load(game_name)
+    hunter = game.team_role == game.code_of(game.team_roles, "HUNTER")
 
+    # first fix of every user that was sent as a hunter, printed in the order
+    # the users appear in the export
+    codes = game.user[hunter]
+    times = game.time[hunter]
+    order = np.argsort(codes, kind="stable")
+    users, starts = np.unique(codes[order], return_index=True)
+    first_times = np.minimum.reduceat(times[order], starts) if len(users) > 0 else []
+    appearance = np.argsort(order[starts])
+    for user, time in zip(users[appearance], np.asarray(first_times)[appearance]):
+        d = datetime.datetime.fromtimestamp(time / 1000).astimezone(datetime.UTC)
+        print(game.users[user], d)
 
-for user, times in hunter_times.items():
-    time = min(times) / 1000
-    d = datetime.datetime.fromtimestamp(time).astimezone(datetime.UTC)
-    print(user, d)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print when every team first reported as a hunter")
+    parser.add_argument("--game", default=GAME, help="game directory in data/")
+    args = parser.parse_args()
+    main(args.game)
@@ -1,34 +1,202 @@
+import argparse
+import csv
+import datetime
 import json
+import uuid
+from pathlib import Path
+
+import numpy as np
 
 start = 1716561247364
 end = 1716562187836
 
+# area the synthetic games take place in
+CENTER_LAT = 49.0015
+CENTER_LON = 12.0955
+METERS_PER_DEGREE = 111_195
+TEAM_COLORS = ["#FF0000", "#84AE9B", "#000000", "#03A1ED", "#F2A900", "#8E44AD", "#27AE60", "#E67E22"]
+
+
+def fake_track():
+    # Turns the hand-written coordinates in fake_data.txt into one runaway track
+    with open("conversion/fake_data.txt") as file:
+        lines = file.readlines()
+
+    lat_long = []
+
+    for line in lines:
+        entries = line.split(" ")
+        lat_long.append((float(entries[1]), float(entries[3])))
+
+    output = []
+    for i, (lat, lon) in enumerate(lat_long):
+        factor = (i + 1) / (len(lat_long) + 2)
+        timestamp = start + round((end - start) * factor)
+        output.append(
+            {
+                "current_location": {
+                    "lat": lat,
+                    "lon": lon,
+                    "timestamp": timestamp,
+                },
+                "active_user": "2a539389-19d7-11ef-afee-e50b875d9764",
+                "game_state": "RUNNING",
+                "team_role": "RUNAWAYS",
+                "team_color": "#84AE9B",
+            }
+        )
+    return output
+
+
+def format_timestamp(timestamp_ms):
+    # Server timestamp format of the log export, e.g. "2024-05-24 15:06:18.752"
+    d = datetime.datetime.fromtimestamp(timestamp_ms / 1000, datetime.UTC)
+    return d.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
 
-with open("conversion/fake_data.txt") as file:
-    lines = file.readlines()
+def fold(x, limit):
+    # Reflects x into [-limit, limit] so random walks stay inside the area
+    return np.abs(np.mod(x - limit, 4 * limit) - 2 * limit) - limit
 
-lat_long = []
 
-for line in lines:
-    entries = line.split(" ")
-    lat_long.append((float(entries[1]), float(entries[3])))
+def fake_team_track(rng, start_ms, end_ms, gps_interval_s, dropout_rate, max_dropout_s, radius_m):
+    # Fix times with jittered intervals and dropout gaps, and a random walk
+    # at walking/running speed that stays within radius_m of the center
+    num_fixes = int((end_ms - start_ms) / (gps_interval_s * 1000) * 1.5) + 2
+    intervals = gps_interval_s * 1000 * rng.uniform(0.5, 1.5, num_fixes)
+    times = np.round(start_ms + np.cumsum(intervals)).astype(np.int64)
+    times = times[times < end_ms]
 
-output = []
-for i, (lat, lon) in enumerate(lat_long):
-    factor = (i + 1) / (len(lat_long) + 2)
-    timestamp = start + round((end - start) * factor)
-    output.append(
+    gap_starts = times[rng.random(len(times)) < dropout_rate]
+    if len(gap_starts) > 0:
+        gap_ends = np.maximum.accumulate(gap_starts + rng.uniform(0, max_dropout_s * 1000, len(gap_starts)))
+        # fixes after the start of a gap and before its end are lost
+        gap_index = np.searchsorted(gap_starts, times, side="left") - 1
+        in_gap = (gap_index >= 0) & (times < gap_ends[np.maximum(gap_index, 0)])
+        times = times[~in_gap]
+
+    step_s = np.diff(times, prepend=times[0]) / 1000
+    heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.4, len(times)))
+    speed = rng.uniform(1.0, 3.5) * rng.uniform(0.5, 1.5, len(times))
+    x = fold(rng.uniform(-radius_m, radius_m) + np.cumsum(speed * step_s * np.cos(heading)), radius_m)
+    y = fold(rng.uniform(-radius_m, radius_m) + np.cumsum(speed * step_s * np.sin(heading)), radius_m)
+    lat = CENTER_LAT + y / METERS_PER_DEGREE
+    lon = CENTER_LON + x / (METERS_PER_DEGREE * np.cos(np.deg2rad(CENTER_LAT)))
+    return times, lat, lon
+
+
+def generate_game(game_name, num_teams=5, duration_s=3600, gps_interval_s=5.0, dropout_rate=0.005, max_dropout_s=120, num_catches=3, seed=0, start_ms=1716560000000, radius_m=600):
+    # Writes a complete data/<game_name>/ tree with the log export files and
+    # teams.csv, shaped like the exports of a real game
+    rng = np.random.default_rng(seed)
+    end_ms = start_ms + duration_s * 1000
+    creation_end_ms = start_ms + min(120_000, duration_s * 100)
+    over_ms = end_ms - min(60_000, duration_s * 50)
+    users = [str(uuid.UUID(bytes=rng.bytes(16), version=1)) for _ in range(num_teams)]
+    names = [f"Team {i + 1}" for i in range(num_teams)]
+    colors = [TEAM_COLORS[i % len(TEAM_COLORS)] for i in range(num_teams)]
+
+    # the first team starts hunting, every caught team joins the hunters
+    initial_hunter = users[0]
+    num_catches = max(1, min(num_catches, num_teams - 1))
+    catch_times = np.sort(rng.uniform(creation_end_ms, over_ms, num_catches)).astype(np.int64)
+    caught = list(rng.permutation(users[1:])[:num_catches])
+    team_caught = []
+    hunters = [initial_hunter]
+    for catch_time, runaway in zip(catch_times, caught):
+        team_caught.append({
+            "timestamp": format_timestamp(int(catch_time)),
+            "runaway_active_user": runaway,
+            "hunter_active_user": str(rng.choice(hunters)),
+        })
+        hunters.append(runaway)
+    catch_time_of = {user: int(t) for user, t in zip(caught, catch_times)}
+    catch_time_of[initial_hunter] = start_ms
+
+    status_updates = []
+    for user, color in zip(users, colors):
+        times, lat, lon = fake_team_track(rng, start_ms, end_ms, gps_interval_s, dropout_rate, max_dropout_s, radius_m)
+        server_times = times + rng.integers(50, 500, len(times))
+        game_state = np.where(times < creation_end_ms, "TEAM_CREATION_PHASE", np.where(times < over_ms, "RUNNING", "OVER"))
+        role = np.where(times >= catch_time_of.get(user, end_ms + 1), "HUNTER", "RUNAWAYS")
+        for i in range(len(times)):
+            status_updates.append({
+                "timestamp": format_timestamp(int(server_times[i])),
+                "current_location": {
+                    "lat": float(lat[i]),
+                    "lon": float(lon[i]),
+                    "timestamp": int(times[i]),
+                },
+                "active_user": user,
+                "game_state": str(game_state[i]),
+                "team_role": str(role[i]),
+                "team_color": color,
+            })
+    # the export has the newest entries at the top
+    status_updates.sort(key=lambda entry: entry["timestamp"], reverse=True)
+    team_caught.reverse()
+
+    team_activated = [
         {
-            "current_location": {
-                "lat": lat,
-                "lon": lon,
-                "timestamp": timestamp,
-            },
-            "active_user": "2a539389-19d7-11ef-afee-e50b875d9764",
-            "game_state": "RUNNING",
-            "team_role": "RUNAWAYS",
-            "team_color": "#84AE9B",
+            "timestamp": format_timestamp(start_ms - 60_000 + i * 1000),
+            "event": "TEAM_ACTIVATED",
+            "active_user": user,
+            "team_color": color,
+            "team_role": "TeamRoleDTO.HUNTER" if user == initial_hunter else "TeamRoleDTO.RUNAWAYS",
+            "team_name": name,
         }
-    )
+        for i, (user, name, color) in reversed(list(enumerate(zip(users, names, colors))))
+    ]
+    user_joined = [
+        {"timestamp": format_timestamp(start_ms - 120_000 + i * 1000), "user_name": name, "user_id": user}
+        for i, (user, name) in reversed(list(enumerate(zip(users, names))))
+    ]
+
+    Path(f"data/{game_name}/log-export").mkdir(parents=True, exist_ok=True)
+    for file_name, data in [
+        ("regular_status_update", status_updates),
+        ("team_caught", team_caught),
+        ("team_activated", team_activated),
+        ("user_joined", user_joined),
+    ]:
+        with open(f"data/{game_name}/log-export/{file_name}.json", "w") as file:
+            json.dump(data, file, indent=4)
+
+    with open(f"data/{game_name}/teams.csv", "w", newline="") as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow(["user_id_1", "active_user", "color", "current_location", "game_id", "image_link", "name", "public_location", "role", "user_id_2"])
+        game_id = str(uuid.UUID(bytes=rng.bytes(16), version=1))
+        for user, name, color in zip(users, names, colors):
+            role = "HUNTER" if user == initial_hunter else "RUNAWAYS"
+            writer.writerow([user, user, color, "", game_id, "", name, "", role, user])
+    return len(status_updates)
+
 
-print(json.dumps(output, indent=4))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create fake game data")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("track", help="print the runaway track from conversion/fake_data.txt (default)")
+    game_parser = subparsers.add_parser("game", help="write a synthetic game to data/<name>/")
+    game_parser.add_argument("name")
+    game_parser.add_argument("--teams", type=int, default=5)
+    game_parser.add_argument("--duration", type=float, default=3600, help="game duration in seconds")
+    game_parser.add_argument("--gps-interval", type=float, default=5.0, help="mean seconds between two fixes of a team")
+    game_parser.add_argument("--dropout-rate", type=float, default=0.005, help="probability that a fix is followed by a gap")
+    game_parser.add_argument("--max-dropout", type=float, default=120, help="longest gap in seconds")
+    game_parser.add_argument("--catches", type=int, default=3)
+    game_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.command == "game":
+        num_entries = generate_game(
+            args.name,
+            num_teams=args.teams,
+            duration_s=args.duration,
+            gps_interval_s=args.gps_interval,
+            dropout_rate=args.dropout_rate,
+            max_dropout_s=args.max_dropout,
+            num_catches=args.catches,
+            seed=args.seed,
+        )
+        print(f"data/{args.name}: {num_entries} status updates")
+    else:
+        print(json.dumps(fake_track(), indent=4))
@@ -1,77 +1,99 @@
 # import required packages
+import argparse
 import json
 import os
-import pandas as pd
-from datetime import datetime
-import pytz
-import itertools
+import numpy as np
+from game import Game
+from trajectories import Trajectories
+from roles import RoleTimeline
+import proximity
+import encounters
+import instrumentation
 
 # specify game
 GAME = "hackaburg-campuswiese"
 
-# load interpolated data
-df = pd.read_parquet(os.path.join("data", GAME, "log-interpol/interpol.parquet"))
-
-# get list of teams
-teams = list(set(c[0] for c in df.columns))
-
-# get catch data
-data_caught = json.load(open(os.path.join('data/', GAME, "log-export/team_caught.json")))
-
-# dictionary of caught timestamps
-caught_timestamps = {}
-for entry in data_caught:
-    entry['timestamp'] = entry['timestamp'][:-4]
-    entry['timestamp'] = entry['timestamp']
-    dt = datetime.strptime(entry['timestamp'], "%Y-%m-%d %H:%M:%S").replace(tzinfo=pytz.UTC)
-    caught_timestamps[entry['runaway_active_user']] = int(dt.timestamp() * 1000)
-# initial hunting team
-entry = data_caught[-1]
-caught_timestamps
-
-# get initial hunter
-initial_hunter = entry['hunter_active_user']
-caught_timestamps[initial_hunter] = 0
-
-# find intervals where hunters are close to prey
-interesting_timestamps = []
-interesting_start = 0
-interesting = False
-for t in df.index:
-    hunters = [initial_hunter] + [team for team in teams if team in caught_timestamps.keys() and caught_timestamps[team] < t]
-    preys = [team for team in teams if team not in hunters]
-    
-    # calculate pairwise distances between hunters and prey
-    still_interesting = False
-    for hunter, prey in itertools.product(hunters, preys):
-        d_lat = df[hunter, 'lat'][t] - df[prey, 'lat'][t]
-        d_lon = df[hunter, 'lon'][t] - df[prey, 'lon'][t]
-        d = ((d_lat*1000)**2 + (d_lon*1000)**2)**0.5
-        if d < 0.5:
-            if not interesting:
-                interesting_start = t
-            still_interesting = True
-            interesting = True
-            break
-    
-    # end of interesting period
-    if interesting and not still_interesting:
-        interesting_timestamps.append({'start': interesting_start, 'end': t})
-        interesting = False
-interesting_timestamps.append({'start': interesting_start, 'end': t})
-print("Interesting timestamps:")
-print(interesting_timestamps)
-
-# load game running interval
-running_interval = json.load(open(os.path.join('data', GAME, "running_interval.json")))
-print("Game running interval:")
-running_interval
-
-# filter game running interval
-interesting_timestamps = [ts for ts in interesting_timestamps if ts['start'] > running_interval['start'] and ts['end'] < running_interval['end']]
-print("Filtered interesting timestamps:")
-print(interesting_timestamps)
-
-# write interesting timestamps to json
-with open(os.path.join('data', GAME, "interesting_timestamps.json"), "w") as f:
-    json.dump(interesting_timestamps, f, indent=4)
\ No newline at end of file
+# a prey closer than this to a hunter makes a time step interesting
+THRESHOLD_METERS = 50
+
+
+def load_positions(game_name):
+    # memory-map the interpolated data, or read interpol.parquet if
+    # interpolate.py has not written the store yet
+    trajectories = Trajectories.load(game_name)
+    teams = trajectories.team_names
+
+    # who is hunting at which time step
+    hunter = RoleTimeline.from_game(Game.load(game_name), teams).hunter_mask(trajectories.time)
+    return trajectories.time, teams, trajectories.lat, trajectories.lon, hunter
+
+
+def find_interesting_timestamps(game_name, threshold_meters=THRESHOLD_METERS):
+    # find intervals where a prey is close to any hunter
+    with instrumentation.stage("load_positions", game_name) as record:
+        times, teams, lat, lon, hunter = load_positions(game_name)
+        record["rows"] = lat.size
+    with instrumentation.stage("nearest_hunter_distance", game_name):
+        nearest = proximity.nearest_hunter_distance(lat, lon, hunter)
+    close = nearest.min(axis=1) < threshold_meters
+    return proximity.find_intervals(times, close)
+
+
+def find_encounters(game_name, radius_meters=THRESHOLD_METERS, running_interval=None):
+    # same as find_interesting_timestamps, but reports the intervals per
+    # hunter/prey pair and, for every prey, the closest approach of a
+    # hunter while the game was running. Scales to many teams through a
+    # spatial index.
+    times, teams, lat, lon, hunter = load_positions(game_name)
+    x, y = encounters.project(lat, lon)
+    with instrumentation.stage("encounter_pairs", game_name) as record:
+        pairs, distance, column = encounters.encounter_pairs(x, y, hunter, radius_meters, nearest=True)
+        record["rows"] = len(pairs[0])
+    if running_interval is not None:
+        # teams gather before the start, only encounters and approaches in
+        # the game count, in the same [start, end) window as batch_analytics.py
+        outside = (times < running_interval["start"]) | (times >= running_interval["end"])
+        inside = ~outside[pairs[0]]
+        pairs = tuple(indices[inside] for indices in pairs)
+        distance[outside] = np.inf
+    return {
+        "encounters": encounters.pair_intervals(times, teams, *pairs),
+        "closest_approaches": encounters.closest_approaches(times, teams, distance, column),
+    }
+
+
+def main(game_name, threshold_meters, write_encounters=False):
+    interesting_timestamps = find_interesting_timestamps(game_name, threshold_meters)
+    print("Interesting timestamps:")
+    print(interesting_timestamps)
+
+    # load game running interval
+    running_interval = json.load(open(os.path.join('data', game_name, "running_interval.json")))
+    print("Game running interval:")
+    print(running_interval)
+
+    # filter game running interval
+    interesting_timestamps = [ts for ts in interesting_timestamps if ts['start'] > running_interval['start'] and ts['end'] < running_interval['end']]
+    print("Filtered interesting timestamps:")
+    print(interesting_timestamps)
+
+    # write interesting timestamps to json
+    with open(os.path.join('data', game_name, "interesting_timestamps.json"), "w") as f:
+        json.dump(interesting_timestamps, f, indent=4)
+
+    if write_encounters:
+        pair_encounters = find_encounters(game_name, threshold_meters, running_interval)
+        print(f"{len(pair_encounters['encounters'])} hunter/prey encounters")
+        with open(os.path.join('data', game_name, "encounters.json"), "w") as f:
+            json.dump(pair_encounters, f, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find intervals where a hunter is close to a prey")
+    parser.add_argument("--game", default=GAME, help="game directory in data/")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD_METERS, help="hunter to prey distance in meters")
+    parser.add_argument("--encounters", action="store_true", help="also write the encounter intervals per hunter/prey pair and the closest approach of a hunter to every prey to encounters.json")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+    main(args.game, args.threshold, args.encounters)
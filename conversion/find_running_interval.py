@@ -1,37 +1,28 @@
 # import required packages
+import argparse
 import json
 import os
-from datetime import datetime
-import pytz
+from game import Game
 
 
 # specify the game
 GAME = "hackaburg-campuswiese"
 
-# load game data
-data = json.load(open(os.path.join("data", GAME, "log-export/regular_status_update.json")))
-
-# find first and last running timestamp
-running_interval = {}
-found_running = False
-for entry in reversed(data): # log has newest entries at the top
-    if not found_running and entry['game_state'] == 'RUNNING':
-        found_running = True
-        running_interval['start'] = entry['timestamp']
-    if found_running and entry['game_state'] == 'OVER':
-        running_interval['end'] = entry['timestamp']
-        break
-
-# convert to iso timestamp
-for key in running_interval:
-    timestamp = running_interval[key]
-    timestamp = timestamp[:-4]
-    dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=pytz.UTC)
-    running_interval[key] = int(dt.timestamp() * 1000)
-    
-# print interval
-print(running_interval)
-
-# write interval to json
-with open(os.path.join("data", GAME, "running_interval.json"), "w") as f:
-    json.dump(running_interval, f, indent=4)
\ No newline at end of file
+
+def main(game_name):
+    # first RUNNING and first OVER server timestamp in epoch ms
+    running_interval = Game.load(game_name).running_interval()
+
+    # print interval
+    print(running_interval)
+
+    # write interval to json
+    with open(os.path.join("data", game_name, "running_interval.json"), "w") as f:
+        json.dump(running_interval, f, indent=4)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the interval in which a game was running")
+    parser.add_argument("--game", default=GAME, help="game directory in data/")
+    args = parser.parse_args()
+    main(args.game)
@@ -0,0 +1,138 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+import build_cache
+
+# inputs of the parsed game, relative to the game directory
+EXPORT_FILES = ["log-export/regular_status_update.json", "log-export/team_caught.json"]
+CACHE_PATH = "cache/game.npz"
+
+
+def parse_timestamps(strings):
+    # Server timestamps like "2024-05-24 15:06:18.752" (UTC) to epoch ms,
+    # parsed by numpy in one go
+    return np.array(strings, dtype="datetime64[ms]").astype(np.int64)
+
+
+def categorical(values):
+    # Sorted categories and int32 codes, missing values become ""
+    categories, codes = np.unique(np.array(["" if value is None else value for value in values], dtype=str), return_inverse=True)
+    return categories, codes.astype(np.int32)
+
+
+class Game:
+    # The exports of one game parsed once into typed columnar arrays. Status
+    # updates are kept in export order (newest first):
+    #   server_time, time (epoch ms of the fix), lat, lon
+    #   user, game_state, team_role as int32 codes into users, game_states
+    #   and team_roles
+    # catches are in chronological order as catch_time and the codes
+    # catch_runaway and catch_hunter. The arrays are cached in
+    # data/<game>/cache/game.npz and reused while the exports are unchanged.
+    def __init__(self, game_name, arrays):
+        self.game_name = game_name
+        self.arrays = arrays
+        for key, value in arrays.items():
+            setattr(self, key, value)
+
+    @classmethod
+    def load(cls, game_name, use_cache=True):
+        digest = build_cache.stage_hash(game_name, [path for path in EXPORT_FILES + ["teams.csv"] if os.path.exists(f"data/{game_name}/{path}")], {})
+        cache_path = f"data/{game_name}/{CACHE_PATH}"
+        if use_cache and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                if str(cached["digest"]) == digest:
+                    return cls(game_name, {key: cached[key] for key in cached.files if key != "digest"})
+        game = cls(game_name, cls.parse(game_name))
+        if use_cache:
+            Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+            np.savez(cache_path, digest=np.array(digest), **game.arrays)
+        return game
+
+    @staticmethod
+    def parse(game_name):
+        with open(f"data/{game_name}/log-export/regular_status_update.json") as file:
+            status_updates = json.load(file)
+        with open(f"data/{game_name}/log-export/team_caught.json") as file:
+            team_caught = json.load(file)
+        team_caught.reverse()
+
+        names = dict()
+        if os.path.exists(f"data/{game_name}/teams.csv"):
+            with open(f"data/{game_name}/teams.csv") as file:
+                for row in csv.DictReader(file):
+                    names[row["active_user"]] = row["name"]
+
+        users, user_codes = categorical(
+            [entry["active_user"] for entry in status_updates]
+            + [entry["runaway_active_user"] for entry in team_caught]
+            + [entry["hunter_active_user"] for entry in team_caught]
+        )
+        num_status_updates = len(status_updates)
+        num_catches = len(team_caught)
+        game_states, game_state_codes = categorical([entry.get("game_state") for entry in status_updates])
+        team_roles, team_role_codes = categorical([entry.get("team_role") for entry in status_updates])
+        return {
+            "server_time": parse_timestamps([entry["timestamp"] for entry in status_updates]),
+            "time": np.array([entry["current_location"]["timestamp"] for entry in status_updates], dtype=np.int64),
+            "lat": np.array([entry["current_location"]["lat"] for entry in status_updates], dtype=np.float64),
+            "lon": np.array([entry["current_location"]["lon"] for entry in status_updates], dtype=np.float64),
+            "user": user_codes[:num_status_updates],
+            "game_state": game_state_codes,
+            "team_role": team_role_codes,
+            "users": users,
+            "user_names": np.array([names.get(user, "") for user in users], dtype=str),
+            "game_states": game_states,
+            "team_roles": team_roles,
+            "catch_time": parse_timestamps([entry["timestamp"] for entry in team_caught]),
+            "catch_runaway": user_codes[num_status_updates:num_status_updates + num_catches],
+            "catch_hunter": user_codes[num_status_updates + num_catches:],
+        }
+
+    def user_code(self, user):
+        return int(np.searchsorted(self.users, user))
+
+    def code_of(self, categories, value):
+        # code of a category or -1 if it does not occur in this game
+        index = int(np.searchsorted(categories, value))
+        return index if index < len(categories) and categories[index] == value else -1
+
+    def fixes(self, user):
+        # (time, lat, lon) of the user sorted by fix time; ties keep the
+        # export order like the stable sort of the per-user json
+        indices = np.flatnonzero(self.user == self.user_code(user))
+        indices = indices[np.argsort(self.time[indices], kind="stable")]
+        return self.time[indices], self.lat[indices], self.lon[indices]
+
+    def active_users(self):
+        # users with status updates, in order of their first update
+        codes, first = np.unique(self.user[::-1], return_index=True)
+        return [str(self.users[code]) for code in codes[np.argsort(first)]]
+
+    def initial_hunter(self):
+        return str(self.users[self.catch_hunter[0]])
+
+    def catch_times(self):
+        # epoch ms at which every caught team turned into a hunter, the
+        # initial hunter is hunting from 0 on
+        catch_times = {str(self.users[runaway]): int(t) for runaway, t in zip(self.catch_runaway, self.catch_time)}
+        catch_times[self.initial_hunter()] = 0
+        return catch_times
+
+    def running_interval(self):
+        # server time of the first RUNNING update and of the first OVER
+        # update after it
+        server_time = self.server_time[::-1]
+        game_state = self.game_state[::-1]
+        running = np.flatnonzero(game_state == self.code_of(self.game_states, "RUNNING"))
+        if len(running) == 0:
+            return dict()
+        interval = {"start": int(server_time[running[0]])}
+        over = np.flatnonzero(game_state[running[0]:] == self.code_of(self.game_states, "OVER"))
+        if len(over) > 0:
+            interval["end"] = int(server_time[running[0] + over[0]])
+        return interval
@@ -0,0 +1,87 @@
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on windows, peak rss is left out there
+    resource = None
+
+# Opt-in stage instrumentation for the conversion scripts. With
+# CONVERSION_REPORT=<path> (or --report) every stage appends one json line
+# with wall time, cpu time, peak rss, tracemalloc peak and row count to the
+# report, so worker processes can write to the same file. With
+# CONVERSION_PROFILE_STAGE=<name> (or --profile-stage) the stages of that
+# name are additionally profiled with cProfile into <name>-<game>-<team>.prof
+REPORT_PATH = os.environ.get("CONVERSION_REPORT")
+PROFILE_STAGE = os.environ.get("CONVERSION_PROFILE_STAGE")
+
+_open_stages = []
+
+
+def add_arguments(parser):
+    parser.add_argument("--report", help="append per-stage timing and memory records to this json lines file")
+    parser.add_argument("--profile-stage", help="write a cProfile dump for every run of this stage")
+
+
+def configure(args):
+    # The environment is set as well so worker processes pick it up
+    global REPORT_PATH, PROFILE_STAGE
+    if args.report:
+        REPORT_PATH = os.environ["CONVERSION_REPORT"] = args.report
+    if args.profile_stage:
+        PROFILE_STAGE = os.environ["CONVERSION_PROFILE_STAGE"] = args.profile_stage
+
+
+@contextmanager
+def stage(name, game=None, team=None):
+    # Yields the record of the stage, callers may set record["rows"]
+    if REPORT_PATH is None and PROFILE_STAGE is None:
+        yield dict()
+        return
+    if game is None and len(_open_stages) > 0:
+        game = _open_stages[-1]["game"]
+    record = {"stage": name, "game": game, "team": team, "pid": os.getpid()}
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if len(_open_stages) > 0:
+        # keep the peak of the enclosing stage before resetting it
+        parent = _open_stages[-1]
+        parent["tracemalloc_peak_bytes"] = max(parent["tracemalloc_peak_bytes"], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    record["tracemalloc_peak_bytes"] = 0
+    _open_stages.append(record)
+
+    profiler = None
+    if name == PROFILE_STAGE:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall_start
+        record["cpu_s"] = time.process_time() - cpu_start
+        if profiler is not None:
+            profiler.disable()
+            parts = [name] + [str(part) for part in (game, team) if part is not None]
+            profiler.dump_stats("-".join(parts) + ".prof")
+        record["tracemalloc_peak_bytes"] = max(record["tracemalloc_peak_bytes"], tracemalloc.get_traced_memory()[1])
+        _open_stages.pop()
+        if len(_open_stages) > 0:
+            parent = _open_stages[-1]
+            parent["tracemalloc_peak_bytes"] = max(parent["tracemalloc_peak_bytes"], record["tracemalloc_peak_bytes"])
+        if resource is not None:
+            # ru_maxrss is in KiB on linux and in bytes on macos
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            record["max_rss_bytes"] = max_rss if sys.platform == "darwin" else max_rss * 1024
+        if REPORT_PATH is not None:
+            with open(REPORT_PATH, "a") as file:
+                file.write(json.dumps(record) + "\n")
@@ -1,94 +1,129 @@
 import numpy as np
 import pandas as pd
 from scipy.interpolate import PchipInterpolator
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import json
-import copy
+import argparse
+import contextlib
 import csv
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from trajectories import Trajectories, STORE_PATH
+import plots
+import kinematics
+import build_cache
+import instrumentation
 
-sns.set_theme()
-
-def main(time_step_ms, inactive_after_ms, average_speed_inteval_ms):
-    for game_name in os.listdir("data/"):
-        teams = dict()
-        for team_json in os.listdir(f"data/{game_name}/log-by-user/"):
-            team_name = team_json.rstrip(".json")
-            team_dataframe = json_to_dataframe(f"data/{game_name}/log-by-user/{team_json}")
-            teams[team_name] = team_dataframe
-        interpol_dataframe = consolidate_data(teams, time_step_ms)
-        Path(f"data/{game_name}/log-interpol").mkdir(parents=True, exist_ok=True)
-        interpol_dataframe.to_parquet(f"data/{game_name}/log-interpol/interpol.parquet")
-        time_equi = interpol_dataframe.index
-        connection_dataframe = connection_status(time_equi, teams, inactive_after_ms)
-        connection_dataframe.to_parquet(f"data/{game_name}/log-interpol/connection.parquet")
-        cumulative_distance = make_cumulative_distance(interpol_dataframe, teams)
-        average_speed = make_average_speed(cumulative_distance, average_speed_inteval_ms // time_step_ms)
-        # plot distances
-        uuid_to_display_name = dict()
-        with open(f"data/{game_name}/teams.csv") as file:
-            reader = csv.reader(file)
-            it = iter(reader)
-            header = next(it)
-            index_active_user = list(header).index("active_user")
-            index_name = list(header).index("name")
-            for row in it:
-                uuid_to_display_name[row[index_active_user]] = row[index_name]
-        plot_distance(cumulative_distance, uuid_to_display_name, game_name)
-        plot_speed(average_speed, uuid_to_display_name, game_name)
+def main(time_step_ms, inactive_after_ms, average_speed_inteval_ms, json_format="rows", jobs=1, force=False, plot=True):
+    game_names = os.listdir("data/")
+    parameters = (time_step_ms, inactive_after_ms, average_speed_inteval_ms, json_format, force, plot)
+    if jobs == 1:
+        # the charts are rendered in a background process while the game is
+        # written back to json
+        with ProcessPoolExecutor(1) if plot else contextlib.nullcontext() as plot_executor:
+            for game_name in game_names:
+                process_game(game_name, *parameters, plot_executor=plot_executor)
+    elif len(game_names) >= jobs:
+        # Enough games to keep every worker busy, one game per task, every
+        # worker renders the charts of its game itself
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = [executor.submit(process_game, game_name, *parameters) for game_name in game_names]
+            for future in futures:
+                future.result()
+    else:
+        # Few large games, fit the teams of each game in parallel instead
+        with ProcessPoolExecutor(jobs) as executor:
+            for game_name in game_names:
+                process_game(game_name, *parameters, executor=executor, plot_executor=executor)
+
+def process_game(game_name, time_step_ms, inactive_after_ms, average_speed_inteval_ms, json_format="rows", force=False, plot=True, executor=None, plot_executor=None):
+    inputs = [f"log-by-user/{team_json}" for team_json in os.listdir(f"data/{game_name}/log-by-user/")] + ["teams.csv"]
+    digest = build_cache.stage_hash(game_name, inputs, {
+        "time_step_ms": time_step_ms,
+        "inactive_after_ms": inactive_after_ms,
+        "average_speed_inteval_ms": average_speed_inteval_ms,
+        "json_format": json_format,
+        "plot": plot,
+    })
+    if not force and build_cache.is_up_to_date(game_name, "interpolate", digest):
+        print(f"{game_name}: interpolate up to date")
+        return
+    with instrumentation.stage("interpolate", game_name):
+        with instrumentation.stage("load_game") as record:
+            teams, raw_entries = load_game(game_name)
+            record["rows"] = sum(len(entries) for entries in raw_entries.values())
+        with instrumentation.stage("consolidate_data") as record:
+            trajectories = consolidate_data(teams, time_step_ms, executor, game_name)
+            record["rows"] = trajectories.values.shape[0] * trajectories.values.shape[1]
+        with instrumentation.stage("connection_status"):
+            connection_status(trajectories, teams, inactive_after_ms)
+        with instrumentation.stage("make_cumulative_distance"):
+            make_cumulative_distance(trajectories)
+        with instrumentation.stage("make_average_speed"):
+            make_average_speed(trajectories, average_speed_inteval_ms // time_step_ms)
+        with instrumentation.stage("write_parquet"):
+            Path(f"data/{game_name}/log-interpol").mkdir(parents=True, exist_ok=True)
+            trajectories.interpol_dataframe().to_parquet(f"data/{game_name}/log-interpol/interpol.parquet")
+            trajectories.connection_dataframe().to_parquet(f"data/{game_name}/log-interpol/connection.parquet")
+        with instrumentation.stage("write_store"):
+            trajectories.save(f"data/{game_name}/{STORE_PATH}")
+        plot_future = None
+        if plot:
+            with instrumentation.stage("downsample_plots") as record:
+                uuid_to_display_name = read_display_names(game_name)
+                labels = [uuid_to_display_name[team_name] for team_name in trajectories.team_names]
+                distance_series = plots.downsample_series(trajectories.time, trajectories.distance)
+                # the trailing average in m/s, the average_speed column is in meters per step
+                speed = kinematics.rolling_speed(trajectories.distance, time_step_ms, average_speed_inteval_ms)
+                speed_series = plots.downsample_series(trajectories.time, speed)
+                record["rows"] = sum(len(time) for time, _ in distance_series + speed_series)
+            if plot_executor is None:
+                plots.plot_game(game_name, distance_series, speed_series, labels)
+            else:
+                plot_future = plot_executor.submit(plots.plot_game, game_name, distance_series, speed_series, labels)
         # Write back to json
-        result_json = []
-        for team_json in os.listdir(f"data/{game_name}/log-by-user/"):
-            with open(f"data/{game_name}/log-by-user/{team_json}") as file:
-                json_data = json.load(file)
-            json_data.sort(key=lambda entry: entry["current_location"]["timestamp"])
-            team_name = team_json.rstrip(".json")
-            #team_dataframe = teams[team_name]
-            current_json_index = 0
-            while json_data[current_json_index+1]["current_location"]["timestamp"] < time_equi[0]:
-                next_json_entry = copy.deepcopy(json_data[current_json_index])
-                next_json_entry["is_connection_active"] = True
-                next_json_entry["is_interpolated"] = False
-                next_json_entry["cumulative_distance"] = 0.0
-                next_json_entry["average_speed"] = 0.0
-                result_json.append(next_json_entry)
-                current_json_index += 1
-            for t in time_equi:
-                while json_data[current_json_index+1]["current_location"]["timestamp"] < t:
-                    next_json_entry = copy.deepcopy(json_data[current_json_index])
-                    next_json_entry["is_connection_active"] = True
-                    next_json_entry["is_interpolated"] = False
-                    next_json_entry["cumulative_distance"] = float(result_json[-1]["cumulative_distance"])
-                    next_json_entry["average_speed"] = float(result_json[-1]["average_speed"])
-                    result_json.append(next_json_entry)
-                    current_json_index += 1
-                assert json_data[current_json_index]["current_location"]["timestamp"] <= t
-                next_json_entry = copy.deepcopy(json_data[current_json_index])
-                next_json_entry["current_location"]["timestamp"] = t
-                next_json_entry["current_location"]["lat"] = interpol_dataframe[team_name, "lat"][t]
-                next_json_entry["current_location"]["lon"] = interpol_dataframe[team_name, "lon"][t]
-                next_json_entry["is_connection_active"] = bool(connection_dataframe[team_name][t])
-                next_json_entry["is_interpolated"] = True
-                next_json_entry["cumulative_distance"] = float(cumulative_distance[team_name][t])
-                next_json_entry["average_speed"] = float(average_speed[team_name][t])
-                result_json.append(next_json_entry)
-            while current_json_index+1 < len(json_data):
-                next_json_entry = copy.deepcopy(json_data[current_json_index])
-                next_json_entry["is_connection_active"] = True
-                next_json_entry["is_interpolated"] = False
-                next_json_entry["cumulative_distance"] = float(result_json[-1]["cumulative_distance"])
-                next_json_entry["average_speed"] = 0.0
-                result_json.append(next_json_entry)
-                current_json_index += 1
-        with open(f"data/{game_name}/log-interpol/interpol.json", "w") as file:
-            json.dump(result_json, file, indent=4)
+        with instrumentation.stage("write_interpol_json") as record:
+            record["rows"] = write_interpol_json(game_name, trajectories, teams, raw_entries, json_format)
+        if plot_future is not None:
+            plot_future.result()
+    plot_outputs = ["distance.png", "speed.png"] if plot else []
+    build_cache.record_stage(game_name, "interpolate", digest, [
+        f"log-interpol/{name}" for name in ["interpol.parquet", "connection.parquet", "interpol.json"] + plot_outputs
+    ] + [f"{STORE_PATH}/{name}" for name in ["grid.json", "values.npy", "connection.npy"]])
 
-def json_to_dataframe(path):
+def read_display_names(game_name):
+    uuid_to_display_name = dict()
+    with open(f"data/{game_name}/teams.csv") as file:
+        reader = csv.reader(file)
+        it = iter(reader)
+        header = next(it)
+        index_active_user = list(header).index("active_user")
+        index_name = list(header).index("name")
+        for row in it:
+            uuid_to_display_name[row[index_active_user]] = row[index_name]
+    return uuid_to_display_name
+
+def load_game(game_name):
+    # Every per-user log is parsed once, the sorted entries are kept for the
+    # json write back and the coordinates for the interpolation
+    teams = dict()
+    raw_entries = dict()
+    for team_json in os.listdir(f"data/{game_name}/log-by-user/"):
+        team_name = team_json.rstrip(".json")
+        raw_entries[team_name] = read_team_json(f"data/{game_name}/log-by-user/{team_json}")
+        teams[team_name] = entries_to_dataframe(raw_entries[team_name])
+    return teams, raw_entries
+
+def read_team_json(path):
     with open(path) as file:
         data = json.load(file)
     data.sort(key=lambda entry: entry["current_location"]["timestamp"])
+    return data
+
+def json_to_dataframe(path):
+    return entries_to_dataframe(read_team_json(path))
+
+def entries_to_dataframe(data):
     lat = []
     lon = []
     timestamp = []
@@ -101,7 +136,7 @@ def json_to_dataframe(path):
     team_dataframe = pd.DataFrame(coords, index=timestamp, columns=["lat", "lon"])
     return team_dataframe
 
-def consolidate_data(teams, time_step_ms):
+def consolidate_data(teams, time_step_ms, executor=None, game_name=None):
     min_times = [np.min(team_dataframe.index) for team_dataframe in teams.values()]
     max_times = [np.max(team_dataframe.index) for team_dataframe in teams.values()]
     #print("min times", np.array(sorted(min_times)) - min(min_times))
@@ -111,112 +146,156 @@ def consolidate_data(teams, time_step_ms):
     # We lose a lot of precision for large timestamps, so shift the region
     # of interest to lie near zero
     time_equi = np.arange(0, max_time - min_time, time_step_ms)
-    columns = pd.MultiIndex.from_product([teams.keys(), ["lat", "lon"]], names=["team_name", "dim"])
-    interpol_dataframe = pd.DataFrame(index=time_equi+min_time, columns=columns)
-    for team_name, team_dataframe in teams.items():
-        spline_lat = PchipInterpolator(team_dataframe.index - min_time, team_dataframe["lat"])
-        spline_lon = PchipInterpolator(team_dataframe.index - min_time, team_dataframe["lon"])
-        interpol_dataframe[team_name, "lat"] = spline_lat(time_equi)
-        interpol_dataframe[team_name, "lon"] = spline_lon(time_equi)
-    return interpol_dataframe
-
-def connection_status(time_equi, teams, inactive_after_ms):
-    # assume time contains equidistant points
-    time_step = time_equi[1] - time_equi[0]
-    num_points = inactive_after_ms // time_step
-    connection_dataframe = pd.DataFrame(index=time_equi, columns=teams.keys())
-    for team_name, team_dataframe in teams.items():
-        time_raw = team_dataframe.index
-        active_connection = np.full(len(time_equi), True)
-        current_raw_index = 0
-        for i, t in enumerate(time_equi):
-            while current_raw_index+1 < len(time_raw) and time_raw[current_raw_index+1] < t:
-                current_raw_index += 1
-            assert time_raw[current_raw_index] <= t
-            if t - time_raw[current_raw_index] > inactive_after_ms:
-                active_connection[i] = False
-        #plt.plot(time_equi, active_connection)
-        #plt.show()
-        connection_dataframe[team_name] = active_connection
-    return connection_dataframe
-
-def make_cumulative_distance(interpol_dataframe, teams):
-    #print(interpol_dataframe.head())
-    earth_radius_in_meters = 6_371_008.8
-    df = pd.DataFrame(index=interpol_dataframe.index, columns=teams.keys())
-    for team_name in teams.keys():
-        lat = np.deg2rad(interpol_dataframe[team_name]["lat"].to_numpy())
-        lon = np.deg2rad(interpol_dataframe[team_name]["lon"].to_numpy())
-        x = earth_radius_in_meters * np.cos(lat) * np.cos(lon)
-        y = earth_radius_in_meters * np.cos(lat) * np.sin(lon)
-        z = earth_radius_in_meters * np.sin(lat)
-        diff_x = np.zeros_like(x)
-        diff_y = np.zeros_like(y)
-        diff_z = np.zeros_like(z)
-        diff_x[1:] = x[1:] - x[:-1]
-        diff_y[1:] = y[1:] - y[:-1]
-        diff_z[1:] = z[1:] - z[:-1]
-        distance = np.hypot(diff_x, np.hypot(diff_y, diff_z))
-        cum_distance = np.cumsum(distance)
-        #plt.plot(cum_distance)
-        df[team_name] = cum_distance
-    #sns.relplot(data=df, kind="line")
-    #plt.show()
-    #print(df.head())
-    return df
-
-def make_average_speed(cumulative_distance, num_points):
-    df = pd.DataFrame(index=cumulative_distance.index, columns=cumulative_distance.columns)
-    kernel = np.arange(num_points)
-    kernel = kernel / np.sum(kernel)
-    time_step_ms = df.index[1] - df.index[0]
-    #print(time_step_ms)
-    #print(kernel)
-    for team_name in df.columns:
-        cum_distance = cumulative_distance[team_name].to_numpy()
-        distance = np.zeros_like(cum_distance)
-        distance[1:] = cum_distance[1:] - cum_distance[:-1]
-        speed_meter_per_second = distance / (time_step_ms / 1000)
-        #plt.plot(speed_meter_per_second)
-        average_speed_meter_per_second = np.convolve(distance, kernel, mode="same")
-        #plt.plot(average_speed_meter_per_second)
-        df[team_name] = average_speed_meter_per_second
-    #sns.relplot(data=df, kind="line")
-    #plt.show()
-    return df
-
-def plot_distance(cumulative_distance, uuid_to_display_name, game_name):
-    df = cumulative_distance.copy(deep=True)
-    df.index = pd.to_datetime(df.index, unit="ms")
-    df.columns = [uuid_to_display_name[uuid] for uuid in df.columns]
-    rp = sns.relplot(data=df, kind="line", height=8, aspect=1)
-    rp.fig.subplots_adjust(top=0.9)
-    rp.fig.suptitle(f"Distance: {game_name}")
-    plt.xlabel("Time")
-    plt.ylabel("Distance in meters")
-    ticks, labels = plt.xticks()
-    for entry in labels:
-        entry.set_text(entry.get_text()[3:])
-    plt.xticks(ticks=ticks, labels=labels)
-    plt.savefig(f"data/{game_name}/log-interpol/distance.png", dpi=96*2)
-    #plt.show()
-
-def plot_speed(average_speed, uuid_to_display_name, game_name):
-    df = average_speed.copy(deep=True)
-    df.index = pd.to_datetime(df.index, unit="ms")
-    df.columns = [uuid_to_display_name[uuid] for uuid in df.columns]
-    rp = sns.relplot(data=df, kind="line", height=8, aspect=1)
-    rp.fig.subplots_adjust(top=0.9)
-    rp.fig.suptitle(f"Speed: {game_name}")
-    plt.xlabel("Time")
-    plt.ylabel("Speed in meters per second")
-    ticks, labels = plt.xticks()
-    for entry in labels:
-        entry.set_text(entry.get_text()[3:])
-    plt.xticks(ticks=ticks, labels=labels)
-    plt.savefig(f"data/{game_name}/log-interpol/speed.png", dpi=96*2)
-    #plt.show()
+    trajectories = Trajectories(time_equi + min_time, teams.keys())
+    arguments = [
+        (team_dataframe.index.to_numpy() - min_time, team_dataframe["lat"].to_numpy(), team_dataframe["lon"].to_numpy(), time_equi, team_name, game_name)
+        for team_name, team_dataframe in teams.items()
+    ]
+    if executor is None:
+        results = [interpolate_team(*argument) for argument in arguments]
+    else:
+        results = executor.map(interpolate_team, *zip(*arguments))
+    for column, (lat, lon) in enumerate(results):
+        trajectories.lat[:, column] = lat
+        trajectories.lon[:, column] = lon
+    return trajectories
+
+def interpolate_team(time_raw, lat_raw, lon_raw, time_equi, team_name=None, game_name=None):
+    # game_name tags the record, in a worker process there is no enclosing
+    # stage to take it from
+    with instrumentation.stage("interpolate_team", game_name, team_name) as record:
+        record["rows"] = len(time_raw)
+        spline_lat = PchipInterpolator(time_raw, lat_raw)
+        spline_lon = PchipInterpolator(time_raw, lon_raw)
+        return spline_lat(time_equi), spline_lon(time_equi)
+
+def connection_status(trajectories, teams, inactive_after_ms):
+    # For every grid point, look up the last raw fix strictly before it with a
+    # binary search over the sorted raw timestamps of each team
+    time_equi = trajectories.time
+    for column, team_dataframe in enumerate(teams.values()):
+        time_raw = team_dataframe.index.to_numpy()
+        last_raw_index = np.searchsorted(time_raw, time_equi, side="left") - 1
+        last_raw_index = np.maximum(last_raw_index, 0)
+        last_raw_time = time_raw[last_raw_index]
+        assert np.all(last_raw_time <= time_equi)
+        trajectories.connection[:, column] = time_equi - last_raw_time <= inactive_after_ms
+
+def make_cumulative_distance(trajectories):
+    kinematics.cumulative_distance(trajectories.lat, trajectories.lon, trajectories.distance)
+
+def make_average_speed(trajectories, num_points):
+    kinematics.weighted_step_distance(trajectories.distance, num_points, trajectories.speed)
+
+def merge_timeline(time_raw, lat_raw, lon_raw, time_equi, lat, lon, connection, cumulative_distance, average_speed):
+    # Merges the raw entries (all but the last one) with the grid points in the
+    # order the viewer expects: raw entry i goes right before the first grid
+    # point later than raw entry i+1 and repeats the distance and speed of the
+    # preceding grid point. Grid point k copies the metadata of the latest
+    # raw entry placed before it.
+    num_raw = len(time_raw) - 1
+    num_equi = len(time_equi)
+    raw_grid_index = np.searchsorted(time_equi, time_raw[1:], side="right")
+    equi_source_index = np.searchsorted(raw_grid_index, np.arange(num_equi), side="right")
+    raw_position = np.arange(num_raw) + raw_grid_index
+    equi_position = np.arange(num_equi) + equi_source_index
+
+    timeline = {
+        "source_index": np.empty(num_raw + num_equi, dtype=np.int64),
+        "time": np.empty(num_raw + num_equi, dtype=np.int64),
+        "lat": np.empty(num_raw + num_equi, dtype=np.float64),
+        "lon": np.empty(num_raw + num_equi, dtype=np.float64),
+        "is_connection_active": np.ones(num_raw + num_equi, dtype=bool),
+        "is_interpolated": np.zeros(num_raw + num_equi, dtype=bool),
+        "cumulative_distance": np.zeros(num_raw + num_equi, dtype=np.float64),
+        "average_speed": np.zeros(num_raw + num_equi, dtype=np.float64),
+    }
+    timeline["source_index"][raw_position] = np.arange(num_raw)
+    timeline["source_index"][equi_position] = equi_source_index
+    timeline["time"][equi_position] = time_equi
+    timeline["lat"][equi_position] = lat
+    timeline["lon"][equi_position] = lon
+    timeline["is_connection_active"][equi_position] = connection
+    timeline["is_interpolated"][equi_position] = True
+    timeline["cumulative_distance"][equi_position] = cumulative_distance
+    timeline["average_speed"][equi_position] = average_speed
+
+    # Raw entries before the first grid point keep zero distance and speed,
+    # the ones after the last grid point keep the final distance at zero speed
+    previous_grid_index = np.minimum(raw_grid_index, num_equi) - 1
+    after_first = raw_grid_index > 0
+    timeline["cumulative_distance"][raw_position[after_first]] = cumulative_distance[previous_grid_index[after_first]]
+    inside = after_first & (raw_grid_index < num_equi)
+    timeline["average_speed"][raw_position[inside]] = average_speed[previous_grid_index[inside]]
+    timeline["time"][raw_position] = time_raw[:-1]
+    timeline["lat"][raw_position] = lat_raw[:-1]
+    timeline["lon"][raw_position] = lon_raw[:-1]
+    return timeline
+
+def write_interpol_json(game_name, trajectories, teams, raw_entries, json_format="rows"):
+    # json_format "rows" keeps one object per entry like the status update
+    # export, "columnar" writes one array per field and team
+    result_rows = []
+    result_columns = dict()
+    for team_name, json_data in raw_entries.items():
+        team_dataframe = teams[team_name]
+        time_raw = team_dataframe.index.to_numpy(dtype=np.int64)
+        lat_raw = team_dataframe["lat"].to_numpy(dtype=np.float64)
+        lon_raw = team_dataframe["lon"].to_numpy(dtype=np.float64)
+        column = trajectories.column(team_name)
+        timeline = merge_timeline(
+            time_raw,
+            lat_raw,
+            lon_raw,
+            trajectories.time,
+            trajectories.lat[:, column],
+            trajectories.lon[:, column],
+            trajectories.connection[:, column],
+            trajectories.distance[:, column],
+            trajectories.speed[:, column],
+        )
+        columns = {key: values.tolist() for key, values in timeline.items()}
+        if json_format == "columnar":
+            result_columns[team_name] = {
+                "time": columns["time"],
+                "lat": columns["lat"],
+                "lon": columns["lon"],
+                "game_state": [json_data[i].get("game_state") for i in columns["source_index"]],
+                "team_role": [json_data[i].get("team_role") for i in columns["source_index"]],
+                "is_connection_active": columns["is_connection_active"],
+                "is_interpolated": columns["is_interpolated"],
+                "cumulative_distance": columns["cumulative_distance"],
+                "average_speed": columns["average_speed"],
+            }
+            continue
+        for row, source_index in enumerate(columns["source_index"]):
+            entry = dict(json_data[source_index])
+            entry["current_location"] = dict(entry["current_location"])
+            if columns["is_interpolated"][row]:
+                entry["current_location"]["timestamp"] = columns["time"][row]
+                entry["current_location"]["lat"] = columns["lat"][row]
+                entry["current_location"]["lon"] = columns["lon"][row]
+            entry["is_connection_active"] = columns["is_connection_active"][row]
+            entry["is_interpolated"] = columns["is_interpolated"][row]
+            entry["cumulative_distance"] = columns["cumulative_distance"][row]
+            entry["average_speed"] = columns["average_speed"][row]
+            result_rows.append(entry)
+    with open(f"data/{game_name}/log-interpol/interpol.json", "w") as file:
+        if json_format == "columnar":
+            json.dump({"format": "columnar", "teams": result_columns}, file, separators=(",", ":"))
+            return sum(len(columns["time"]) for columns in result_columns.values())
+        else:
+            json.dump(result_rows, file, indent=4)
+            return len(result_rows)
 
 if __name__ == "__main__":
-    main(time_step_ms=5_000, inactive_after_ms=30_000, average_speed_inteval_ms=60_000)
+    parser = argparse.ArgumentParser(description="Interpolate the per-user logs of every game")
+    parser.add_argument("--json-format", choices=["rows", "columnar"], default="rows", help="layout of log-interpol/interpol.json")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes for games and teams")
+    parser.add_argument("--force", action="store_true", help="rebuild games even if their inputs are unchanged")
+    parser.add_argument("--no-plots", action="store_true", help="skip distance.png and speed.png")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+    main(time_step_ms=5_000, inactive_after_ms=30_000, average_speed_inteval_ms=60_000, json_format=args.json_format, jobs=args.jobs, force=args.force, plot=not args.no_plots)
 
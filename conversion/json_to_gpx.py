@@ -1,90 +1,134 @@
-import gpxpy
-import gpxpy.gpx
-import os
-import json
-import datetime
-
-json_dir = "data/log-by-user"
-
-
-def parse_team_caught():
-    with open("data/log-export/team_caught.json") as file:
-        data = json.load(file)
-
-    catch_times = {}
-    for entry in data:
-        catch_times[entry["runaway_active_user"]] = datetime.datetime.fromisoformat(
-            entry["timestamp"] + "Z"
-        ).timestamp()
-
-    catch_times[data[-1]["hunter_active_user"]] = 0.0
-    return catch_times
-
-
-def main():
-    catch_times = parse_team_caught()
-    all_points = []
-    for file_name in os.listdir(json_dir):
-        full_name = os.path.join(json_dir, file_name)
-        user_id = os.path.splitext(file_name)[0]
-        with open(full_name) as file:
-            data = json.load(file)
-        data.sort(key=lambda d: d["current_location"]["timestamp"])
-
-        user_gpx = gpxpy.gpx.GPX()
-        # Create first track in our GPX:
-        gpx_track = gpxpy.gpx.GPXTrack()
-
-        # Create first segment in our GPX track:
-        gpx_segment = gpxpy.gpx.GPXTrackSegment()
-        gpx_track.segments.append(gpx_segment)
-
-        points = []
-        hunter_points = []
-        runaway_points = []
-
-        # Create points:
-        for d in data:
-            location = d["current_location"]
-            time = datetime.datetime.fromtimestamp(
-                location["timestamp"] / 1000, datetime.UTC
-            )
-            point = gpxpy.gpx.GPXTrackPoint(
-                location["lat"],
-                location["lon"],
-                time=time,
-            )
-            points.append(point)
-            if user_id not in catch_times or catch_times[user_id] > time.timestamp():
-                runaway_points.append(point)
-            else:
-                hunter_points.append(point)
-
-        write_gpx([points], user_id, f"data/gpx/{user_id}.gpx")
-        write_gpx(
-            [hunter_points], f"hunter_{user_id}", f"data/gpx/hunter/{user_id}.gpx"
-        )
-        write_gpx(
-            [runaway_points], f"runaway_{user_id}", f"data/gpx/runaway/{user_id}.gpx"
-        )
-        all_points.append(points)
-    write_gpx(all_points, "combined", "data/gpx/combined.gpx")
-
-
-def write_gpx(point_lists, name, url):
-    gpx = gpxpy.gpx.GPX()
-    gpx.name = name
-    # Create first track in our GPX:
-    for point_list in point_lists:
-        gpx_track = gpxpy.gpx.GPXTrack()
-        gpx.tracks.append(gpx_track)
-
-        # Create first segment in our GPX track:
-        gpx_segment = gpxpy.gpx.GPXTrackSegment()
-        gpx_track.segments.append(gpx_segment)
-        gpx_segment.points.extend(point_list)
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from game import Game
+from roles import RoleTimeline, HUNTER
+import instrumentation
+
+# specify game
+GAME = "testlauf-neupfarrplatz"
+
+# The files are written directly in the layout gpxpy's to_xml produces, so
+# gpxpy parses them exactly like before
+GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx xmlns="http://www.topografix.com/GPX/1/1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd" '
+    'version="1.1" creator="gpx.py -- https://github.com/tkrajina/gpxpy">\n'
+    "  <metadata>\n"
+    "    <name>{name}</name>\n"
+    "  </metadata>\n"
+)
+GPX_FOOTER = "</gpx>"
+
+# number of track points formatted at once
+CHUNK_SIZE = 4096
+
+
+def format_coordinate(value):
+    # like gpxpy, which writes str(float) and avoids scientific notation
+    result = repr(value)
+    if "e" not in result:
+        return result
+    return format(value, ".10f").rstrip("0").rstrip(".")
+
+
+def format_times(times):
+    # Epoch ms to the isoformat() of utc datetimes, which leaves out the
+    # fraction for whole seconds
+    seconds = np.datetime_as_string(np.asarray(times).astype("datetime64[ms]").astype("datetime64[s]"))
+    milliseconds = np.mod(times, 1000)
+    return [
+        f"{second}.{millisecond:03d}000Z" if millisecond else f"{second}Z"
+        for second, millisecond in zip(seconds.tolist(), milliseconds.tolist())
+    ]
+
+
+def write_track(file, times, lats, lons):
+    file.write("  <trk>\n    <trkseg>\n")
+    for start in range(0, len(times), CHUNK_SIZE):
+        end = start + CHUNK_SIZE
+        file.write("".join(
+            f'      <trkpt lat="{format_coordinate(lat)}" lon="{format_coordinate(lon)}">\n'
+            f"        <time>{time}</time>\n"
+            "      </trkpt>\n"
+            for time, lat, lon in zip(format_times(times[start:end]), lats[start:end].tolist(), lons[start:end].tolist())
+        ))
+    file.write("    </trkseg>\n  </trk>\n")
+
+
+def write_gpx(tracks, name, url):
+    # tracks is an iterable of (times, lats, lons) arrays, every track is
+    # written as soon as it is produced
     with open(url, "w") as file:
-        file.write(gpx.to_xml())
-
-
-main()
+        file.write(GPX_HEADER.format(name=escape(name)))
+        for times, lats, lons in tracks:
+            write_track(file, times, lats, lons)
+        file.write(GPX_FOOTER)
+
+
+def write_user_gpx(gpx_dir, user_id, times, lats, lons, is_hunter):
+    write_gpx([(times, lats, lons)], user_id, f"{gpx_dir}/{user_id}.gpx")
+    write_gpx([(times[is_hunter], lats[is_hunter], lons[is_hunter])], f"hunter_{user_id}", f"{gpx_dir}/hunter/{user_id}.gpx")
+    write_gpx([(times[~is_hunter], lats[~is_hunter], lons[~is_hunter])], f"runaway_{user_id}", f"{gpx_dir}/runaway/{user_id}.gpx")
+
+
+def export_user(game_name, user_id, times, lats, lons, is_hunter):
+    with instrumentation.stage("json_to_gpx_user", game_name, user_id) as record:
+        record["rows"] = len(times)
+        write_user_gpx(f"data/{game_name}/gpx", user_id, times, lats, lons, is_hunter)
+
+
+def export_game(game_name, executor=None):
+    gpx_dir = f"data/{game_name}/gpx"
+    Path(f"{gpx_dir}/hunter").mkdir(parents=True, exist_ok=True)
+    Path(f"{gpx_dir}/runaway").mkdir(parents=True, exist_ok=True)
+    game = Game.load(game_name)
+    roles = RoleTimeline.from_game(game)
+    user_ids = game.active_users()
+    tracks = [game.fixes(user_id) for user_id in user_ids]
+    # a fix sent at the very catch time is already a hunter point
+    hunter_masks = [roles.team_roles(user_id, times, inclusive=True) == HUNTER for user_id, (times, _, _) in zip(user_ids, tracks)]
+
+    arguments = (itertools.repeat(game_name), user_ids, *zip(*tracks), hunter_masks)
+    if executor is None:
+        list(map(export_user, *arguments))
+        results = []
+    else:
+        # the combined file is written while the workers export the users
+        results = executor.map(export_user, *arguments)
+    with instrumentation.stage("json_to_gpx_combined", game_name):
+        write_gpx(tracks, "combined", f"{gpx_dir}/combined.gpx")
+    list(results)
+
+
+def main(game_names, jobs=1):
+    if jobs == 1:
+        for game_name in game_names:
+            export_game(game_name)
+    elif len(game_names) >= jobs:
+        # Enough games to keep every worker busy, one game per task
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = [executor.submit(export_game, game_name) for game_name in game_names]
+            for future in futures:
+                future.result()
+    else:
+        # Few games, export the users of each game in parallel instead
+        with ProcessPoolExecutor(jobs) as executor:
+            for game_name in game_names:
+                export_game(game_name, executor)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the tracks of games as gpx")
+    parser.add_argument("--game", nargs="+", default=[GAME], help="game directories in data/")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+    main(args.game, args.jobs)
@@ -0,0 +1,130 @@
+import numpy as np
+from scipy.ndimage import convolve1d
+
+from proximity import EARTH_RADIUS_IN_METERS
+
+# Distance and speed of all teams on the uniform time grid. Every function
+# works on (time, team) arrays in chunks of about CHUNK_VALUES values, so the
+# temporaries stay the same size for arbitrarily long games and many teams,
+# and the inputs may be memory-mapped stores.
+CHUNK_VALUES = 1 << 16
+
+# trailing windows of the rolling speeds
+SPEED_WINDOWS_MS = [10_000, 60_000, 300_000]
+
+# a team is moving while its speed over the shortest window is above this
+MOVING_SPEED_MPS = 0.5
+
+
+def ecef(lat, lon):
+    # Earth centered coordinates in meters of positions in degrees
+    lat = np.deg2rad(lat)
+    lon = np.deg2rad(lon)
+    radius_cos_lat = EARTH_RADIUS_IN_METERS * np.cos(lat)
+    x = radius_cos_lat * np.cos(lon)
+    y = radius_cos_lat * np.sin(lon)
+    z = EARTH_RADIUS_IN_METERS * np.sin(lat)
+    return x, y, z
+
+
+def chunk_rows(array, chunk_size=None):
+    # time steps per chunk of a (time, team) array
+    if chunk_size is not None:
+        return chunk_size
+    return max(CHUNK_VALUES // max(array.shape[1], 1), 1)
+
+
+def cumulative_distance(lat, lon, out, chunk_size=None):
+    # Writes the cumulative length of the straight lines between consecutive
+    # grid positions to out, 0 at the first row. For grid steps of a few
+    # meters the chord equals the great circle distance far below a
+    # millimeter. The running total is carried from chunk to chunk and added
+    # in the same order as one cumsum over the whole game.
+    chunk_size = chunk_rows(lat, chunk_size)
+    previous = None
+    total = np.zeros(lat.shape[1])
+    for start in range(0, len(lat), chunk_size):
+        end = start + chunk_size
+        x, y, z = ecef(np.asarray(lat[start:end]), np.asarray(lon[start:end]))
+        if previous is None:
+            previous = x[0], y[0], z[0]
+        diff_x = np.diff(x, axis=0, prepend=previous[0][None])
+        diff_y = np.diff(y, axis=0, prepend=previous[1][None])
+        diff_z = np.diff(z, axis=0, prepend=previous[2][None])
+        step = np.hypot(diff_x, np.hypot(diff_y, diff_z))
+        step[0] = total + step[0]
+        np.cumsum(step, axis=0, out=out[start:end])
+        previous = x[-1], y[-1], z[-1]
+        total = out[min(end, len(lat)) - 1]
+
+
+def window_steps(window_ms, step_ms):
+    return max(round(window_ms / step_ms), 1)
+
+
+def rolling_speed(cumulative, step_ms, window_ms, start=0, end=None):
+    # Speed in meters per second over the trailing window_ms of the rows
+    # start:end, from differences of the cumulative distance. The first rows
+    # of a game average over the steps there are, the first row is 0.
+    end = len(cumulative) if end is None else end
+    steps = window_steps(window_ms, step_ms)
+    rows = np.arange(start, end)
+    before = np.maximum(rows - steps, 0)
+    covered = np.asarray(cumulative[start:end]) - np.asarray(cumulative[before])
+    seconds = (rows - before)[:, None] * step_ms / 1000
+    return np.divide(covered, seconds, out=np.zeros_like(covered), where=seconds > 0)
+
+
+def summarize(cumulative, step_ms, windows_ms=SPEED_WINDOWS_MS, moving_speed=MOVING_SPEED_MPS, chunk_size=None):
+    # Per team maxima of the rolling speeds, the largest acceleration and
+    # deceleration of the speed over the shortest window and the time spent
+    # moving faster than moving_speed, in one pass over the chunks
+    teams = cumulative.shape[1]
+    top_speeds = {window_ms: np.zeros(teams) for window_ms in windows_ms}
+    acceleration = np.zeros(teams)
+    deceleration = np.zeros(teams)
+    moving_steps = np.zeros(teams, dtype=np.int64)
+    shortest = min(windows_ms)
+    previous = None
+    chunk_size = chunk_rows(cumulative, chunk_size)
+    for start in range(0, len(cumulative), chunk_size):
+        end = min(start + chunk_size, len(cumulative))
+        for window_ms in windows_ms:
+            speed = rolling_speed(cumulative, step_ms, window_ms, start, end)
+            np.maximum(top_speeds[window_ms], speed.max(axis=0), out=top_speeds[window_ms])
+            if window_ms != shortest:
+                continue
+            moving_steps += (speed > moving_speed).sum(axis=0)
+            change = np.diff(speed, axis=0, prepend=speed[:1] if previous is None else previous[None]) / (step_ms / 1000)
+            np.maximum(acceleration, change.max(axis=0), out=acceleration)
+            np.minimum(deceleration, change.min(axis=0), out=deceleration)
+            previous = speed[-1]
+    return {
+        **{f"top_speed_{window_ms // 1000}s_mps": top_speeds[window_ms] for window_ms in windows_ms},
+        "max_acceleration_mps2": acceleration,
+        "max_deceleration_mps2": -deceleration,
+        "moving_s": moving_steps * step_ms / 1000,
+    }
+
+
+def weighted_step_distance(cumulative, num_points, out, chunk_size=None):
+    # The average_speed of interpol.json: a weighted mean of the step
+    # distances (meters per grid step, not per second) around every row, the
+    # weights rise linearly from the step (num_points - 1) // 2 rows ahead to
+    # the step num_points // 2 rows back, aligned like np.convolve(...,
+    # mode="same") on the whole game. All teams of a chunk are convolved in
+    # one call together with the rows the kernel reaches into its neighbours.
+    kernel = np.arange(num_points)
+    kernel = kernel / np.sum(kernel)
+    ahead = (num_points - 1) // 2
+    behind = num_points - 1 - ahead
+    chunk_size = chunk_rows(cumulative, chunk_size)
+    for start in range(0, len(cumulative), chunk_size):
+        end = min(start + chunk_size, len(cumulative))
+        first = max(start - behind, 0)
+        last = min(end + ahead, len(cumulative))
+        distance = np.zeros((last - first, cumulative.shape[1]))
+        distance[1 if first == 0 else 0:] = np.diff(cumulative[max(first - 1, 0):last], axis=0)
+        # the center of an even kernel is one step later than in np.convolve
+        speed = convolve1d(distance, kernel, axis=0, mode="constant", origin=ahead - num_points // 2)
+        out[start:end] = speed[start - first:end - first]
@@ -0,0 +1,201 @@
+import argparse
+import contextlib
+import heapq
+import json
+import socket
+import sys
+import time
+from collections import deque
+
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+
+from split_teams import iter_json_array
+import kinematics
+
+# PCHIP slopes only depend on the neighbouring fixes, so once fix n has
+# arrived the spline on [n-2, n-1] is final and a fit over fixes n-3..n
+# reproduces it exactly. The first fixes use the same end point formula as
+# the fit over the whole log in interpolate.consolidate_data.
+WINDOW_SIZE = 4
+
+# fixes of a team that are held back to sort in fixes arriving late, a fix
+# older than the last interpolated one is dropped
+REORDER_FIXES = 2
+
+
+class LiveTeam:
+    # Incremental version of consolidate_data, connection_status,
+    # make_cumulative_distance and make_average_speed for a single team.
+    # Grid points are multiples of time_step_ms so all teams share one grid.
+    def __init__(self, time_step_ms, inactive_after_ms, average_speed_inteval_ms, reorder_fixes=REORDER_FIXES, name=""):
+        self.name = name
+        self.time_step_ms = time_step_ms
+        self.inactive_after_ms = inactive_after_ms
+        self.time_raw = deque(maxlen=WINDOW_SIZE)
+        self.lat_raw = deque(maxlen=WINDOW_SIZE)
+        self.lon_raw = deque(maxlen=WINDOW_SIZE)
+        self.next_grid_time = None
+        self.last_position = None
+        self.cumulative_distance = 0.0
+        self.recent_distances = deque(maxlen=max(average_speed_inteval_ms // time_step_ms, 1))
+        self.reorder_fixes = reorder_fixes
+        self.pending = []
+
+    def add_fix(self, timestamp, lat, lon):
+        # Returns the grid points that became final through this fix as a
+        # columnar delta, or None. The fix is interpolated once reorder_fixes
+        # later ones have arrived, so fixes up to that many places out of
+        # order are sorted in like interpolate.py does.
+        if (len(self.time_raw) > 0 and timestamp <= self.time_raw[-1]) or any(fix[0] == timestamp for fix in self.pending):
+            print(f"{self.name}: dropped fix at {timestamp}, repeated or too far out of order", file=sys.stderr)
+            return None
+        heapq.heappush(self.pending, (timestamp, lat, lon))
+        if len(self.pending) <= self.reorder_fixes:
+            return None
+        return self.interpolate_fix(*heapq.heappop(self.pending))
+
+    def interpolate_fix(self, timestamp, lat, lon):
+        self.time_raw.append(timestamp)
+        self.lat_raw.append(lat)
+        self.lon_raw.append(lon)
+        if self.next_grid_time is None:
+            self.next_grid_time = -(-timestamp // self.time_step_ms) * self.time_step_ms
+        if len(self.time_raw) < 3:
+            return None
+        final_until = self.time_raw[-2]
+        if self.next_grid_time > final_until:
+            return None
+        grid = np.arange(self.next_grid_time, final_until + 1, self.time_step_ms)
+        self.next_grid_time = grid[-1] + self.time_step_ms
+
+        # shift to the window start to keep precision, like consolidate_data
+        time_raw = np.array(self.time_raw)
+        offset = time_raw[0]
+        lat = PchipInterpolator(time_raw - offset, np.array(self.lat_raw))(grid - offset)
+        lon = PchipInterpolator(time_raw - offset, np.array(self.lon_raw))(grid - offset)
+
+        last_raw_index = np.maximum(np.searchsorted(time_raw, grid, side="left") - 1, 0)
+        is_connection_active = grid - time_raw[last_raw_index] <= self.inactive_after_ms
+
+        cumulative_distance = np.empty(len(grid))
+        speed = np.empty(len(grid))
+        for i in range(len(grid)):
+            position = np.array(kinematics.ecef(lat[i], lon[i]))
+            if self.last_position is not None:
+                distance = float(np.linalg.norm(position - self.last_position))
+                self.cumulative_distance += distance
+                self.recent_distances.append(distance)
+            self.last_position = position
+            cumulative_distance[i] = self.cumulative_distance
+            if len(self.recent_distances) > 0:
+                speed[i] = sum(self.recent_distances) / (len(self.recent_distances) * self.time_step_ms / 1000)
+            else:
+                speed[i] = 0.0
+        return {
+            "time": grid.tolist(),
+            "lat": lat.tolist(),
+            "lon": lon.tolist(),
+            "is_connection_active": is_connection_active.tolist(),
+            "cumulative_distance": cumulative_distance.tolist(),
+            # trailing mean in m/s, not the centered average_speed of
+            # interpol.json in meters per grid step
+            "speed_mps": speed.tolist(),
+        }
+
+
+class LiveGame:
+    def __init__(self, time_step_ms, inactive_after_ms, average_speed_inteval_ms):
+        self.parameters = (time_step_ms, inactive_after_ms, average_speed_inteval_ms)
+        self.teams = dict()
+
+    def add_entry(self, entry):
+        # entry is a regular_status_update record, the delta additionally
+        # carries the user and the game state of the fix
+        user = entry["active_user"]
+        if user not in self.teams:
+            self.teams[user] = LiveTeam(*self.parameters, name=user)
+        location = entry["current_location"]
+        delta = self.teams[user].add_fix(location["timestamp"], location["lat"], location["lon"])
+        if delta is not None:
+            delta["active_user"] = user
+            delta["game_state"] = entry.get("game_state")
+        return delta
+
+
+def follow_file(path, poll_interval=0.5):
+    # Yields the records of a json lines file and keeps waiting for new lines,
+    # like tail -f
+    with open(path) as file:
+        partial = ""
+        while True:
+            line = file.readline()
+            if line == "":
+                time.sleep(poll_interval)
+                continue
+            partial += line
+            if not partial.endswith("\n"):
+                continue
+            if partial.strip() != "":
+                yield json.loads(partial)
+            partial = ""
+
+
+def read_socket(host, port):
+    # Yields the json lines records sent by a game server (or serve_replay)
+    with socket.create_connection((host, port)) as connection:
+        with connection.makefile() as file:
+            for line in file:
+                if line.strip() != "":
+                    yield json.loads(line)
+
+
+def serve_replay(export_path, port, speedup=1.0):
+    # Local stand-in for the game server: replays a finished export (newest
+    # entry first) in chronological order as json lines to the first client
+    entries = list(iter_json_array(export_path))
+    entries.reverse()
+    with socket.create_server(("localhost", port)) as server:
+        connection, _ = server.accept()
+        with connection, connection.makefile("w") as file:
+            previous_time = None
+            for entry in entries:
+                current_time = entry["current_location"]["timestamp"]
+                if previous_time is not None and current_time > previous_time and speedup > 0:
+                    time.sleep((current_time - previous_time) / 1000 / speedup)
+                if previous_time is None or current_time > previous_time:
+                    previous_time = current_time
+                file.write(json.dumps(entry) + "\n")
+                file.flush()
+
+
+def main(entries, output, time_step_ms, inactive_after_ms, average_speed_inteval_ms):
+    game = LiveGame(time_step_ms, inactive_after_ms, average_speed_inteval_ms)
+    for entry in entries:
+        delta = game.add_entry(entry)
+        if delta is not None:
+            output.write(json.dumps(delta, separators=(",", ":")) + "\n")
+            output.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interpolate a running game and publish the new grid points as json lines")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--follow", help="json lines status update log that is still being written")
+    source.add_argument("--connect", help="host:port of a server sending json lines status updates")
+    source.add_argument("--serve-replay", help="replay a regular_status_update.json export on --port instead")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay speed factor, 0 for no delay")
+    parser.add_argument("--output", help="append deltas to this file instead of stdout")
+    args = parser.parse_args()
+    if args.serve_replay:
+        serve_replay(args.serve_replay, args.port, args.speedup)
+        sys.exit()
+    if args.follow:
+        entries = follow_file(args.follow)
+    else:
+        host, port = args.connect.rsplit(":", 1)
+        entries = read_socket(host, int(port))
+    # closed on ctrl-c as well, so no buffered delta is lost
+    with open(args.output, "a") if args.output else contextlib.nullcontext(sys.stdout) as output:
+        main(entries, output, time_step_ms=5_000, inactive_after_ms=30_000, average_speed_inteval_ms=60_000)
@@ -0,0 +1,78 @@
+import numpy as np
+import matplotlib
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+from cycler import cycler
+import seaborn as sns
+
+import instrumentation
+
+# Charts of the interpolated grid. The series are reduced to a few points per
+# pixel column before plotting, so the rendering cost does not grow with the
+# length of the game or the grid resolution. Figures are drawn with plain
+# matplotlib on the Agg canvas without pyplot state, so they can be rendered
+# in worker processes.
+
+# same size and resolution as the former seaborn relplots
+FIGSIZE = (8, 8)
+DPI = 96 * 2
+
+# the rcParams sns.set_theme() sets, applied only while drawing
+THEME = {**sns.axes_style("darkgrid"), **sns.plotting_context("notebook"), "axes.prop_cycle": cycler(color=sns.color_palette("deep"))}
+
+# dash patterns seaborn gives the lines of a wide dataframe
+DASHES = [(None, None), (4, 1.5), (1, 1), (3, 1.25, 1.5, 1.25), (5, 1, 1, 1)]
+
+# buckets of the downsampling, one per pixel column of the figure
+BUCKETS = FIGSIZE[0] * DPI
+
+
+def downsample_minmax(values, buckets=BUCKETS):
+    # Indices of the minimum and maximum of every bucket of consecutive
+    # points plus the first and last point, in time order. Lines through
+    # these points cover the same pixels as the full series.
+    if len(values) <= 2 * buckets:
+        return np.arange(len(values))
+    bucket = np.arange(len(values)) * buckets // len(values)
+    # sorted by bucket and then by value, the first and last point of a
+    # bucket are its minimum and maximum
+    order = np.lexsort((values, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(buckets))
+    ends = np.append(starts[1:], len(values)) - 1
+    return np.unique(np.concatenate([[0, len(values) - 1], order[starts], order[ends]]))
+
+
+def downsample_series(time, columns, buckets=BUCKETS):
+    # Downsamples every column of a (time, team) array on its own and returns
+    # (times, values) pairs
+    return [
+        (time[indices], columns[indices, column])
+        for column in range(columns.shape[1])
+        for indices in [downsample_minmax(columns[:, column], buckets)]
+    ]
+
+
+def plot_lines(series, labels, title, ylabel, path):
+    # the tight layout makes room for the legend without drawing the figure
+    # twice like savefig(bbox_inches="tight")
+    fig = Figure(figsize=FIGSIZE, layout="tight")
+    ax = fig.add_subplot()
+    for index, ((time, values), label) in enumerate(zip(series, labels)):
+        ax.plot(time.astype("datetime64[ms]"), values, label=label, dashes=DASHES[index % len(DASHES)])
+    fig.suptitle(title)
+    ax.set_xlabel("Time")
+    ax.set_ylabel(ylabel)
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
+    ax.legend(loc="center left", bbox_to_anchor=(1, 0.5), frameon=False)
+    fig.savefig(path, dpi=DPI)
+
+
+def plot_game(game_name, distance_series, speed_series, labels):
+    # Renders distance.png and speed.png of a game from downsampled series
+    with matplotlib.rc_context(THEME):
+        with instrumentation.stage("plot_distance", game_name) as record:
+            record["rows"] = sum(len(time) for time, _ in distance_series)
+            plot_lines(distance_series, labels, f"Distance: {game_name}", "Distance in meters", f"data/{game_name}/log-interpol/distance.png")
+        with instrumentation.stage("plot_speed", game_name) as record:
+            record["rows"] = sum(len(time) for time, _ in speed_series)
+            plot_lines(speed_series, labels, f"Speed: {game_name}", "Speed in meters per second", f"data/{game_name}/log-interpol/speed.png")
@@ -0,0 +1,52 @@
+import numpy as np
+
+EARTH_RADIUS_IN_METERS = 6_371_008.8
+
+
+def haversine(lat_1, lon_1, lat_2, lon_2):
+    # Great circle distance in meters between coordinates given in degrees,
+    # the arguments broadcast against each other
+    lat_1 = np.deg2rad(lat_1)
+    lon_1 = np.deg2rad(lon_1)
+    lat_2 = np.deg2rad(lat_2)
+    lon_2 = np.deg2rad(lon_2)
+    a = np.sin((lat_2 - lat_1) / 2) ** 2 + np.cos(lat_1) * np.cos(lat_2) * np.sin((lon_2 - lon_1) / 2) ** 2
+    return 2 * EARTH_RADIUS_IN_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def hunter_prey_distances(lat, lon, hunter):
+    # (time, hunter team, prey team) distance tensor for (time, team) arrays.
+    # Pairs that are not a hunter and a prey at that time are inf.
+    distance = haversine(lat[:, :, None], lon[:, :, None], lat[:, None, :], lon[:, None, :])
+    distance[~(hunter[:, :, None] & ~hunter[:, None, :])] = np.inf
+    return distance
+
+
+def nearest_hunter_distance(lat, lon, hunter, chunk_size=4096):
+    # (time, team) distance from every prey to its closest hunter, inf for
+    # hunters and while there is no hunter. Works on chunks of time steps so
+    # the pairwise tensor never exceeds chunk_size * teams**2 entries.
+    nearest = np.empty(lat.shape, dtype=np.float64)
+    for start in range(0, len(lat), chunk_size):
+        end = start + chunk_size
+        distance = hunter_prey_distances(lat[start:end], lon[start:end], hunter[start:end])
+        nearest[start:end] = distance.min(axis=1, initial=np.inf)
+    return nearest
+
+
+def find_runs(mask):
+    # (start, end) index pairs of the runs of True in a 1d bool array, end is
+    # exclusive
+    padded = np.concatenate([[False], mask, [False]])
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    return list(zip(changes[::2].tolist(), changes[1::2].tolist()))
+
+
+def find_intervals(times, mask):
+    # Runs of True as {"start": time, "end": time} dicts. A run ends at the
+    # first time step where the mask is False again, or at the last time step
+    times = np.asarray(times)
+    return [
+        {"start": int(times[start]), "end": int(times[min(end, len(times) - 1)])}
+        for start, end in find_runs(mask)
+    ]
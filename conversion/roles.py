@@ -0,0 +1,59 @@
+import numpy as np
+
+# role codes of the int8 role matrices
+RUNAWAY = 0
+HUNTER = 1
+
+
+class RoleTimeline:
+    # Who is hunting when, built once from the catches. Every team changes its
+    # role at most once, from runaway to hunter right after it has been
+    # caught, so the timeline is stored as the change point of every team:
+    # -inf for the initial hunter and inf for teams that were never caught.
+    # Lookups broadcast over arbitrary arrays of epoch ms timestamps.
+    def __init__(self, team_names, catch_times, initial_hunter):
+        self.team_names = list(team_names)
+        self.hunter_since = np.array([
+            -np.inf if team_name == initial_hunter else catch_times.get(team_name, np.inf)
+            for team_name in self.team_names
+        ], dtype=np.float64)
+
+    @classmethod
+    def from_game(cls, game, team_names=None):
+        # game is a game.Game, the columns default to the users of its export
+        if team_names is None:
+            team_names = game.active_users()
+        return cls(team_names, game.catch_times(), game.initial_hunter())
+
+    def column(self, team_name):
+        return self.team_names.index(team_name)
+
+    def hunter_mask(self, times):
+        # (time, team) bool mask which is True while a team is hunting
+        times = np.asarray(times)
+        return self.hunter_since[None, :] < times[:, None]
+
+    def matrix(self, times):
+        # (time, team) int8 matrix of RUNAWAY and HUNTER codes
+        return self.hunter_mask(times).astype(np.int8)
+
+    def roles_at(self, t):
+        # int8 role of every team at a single timestamp
+        return (self.hunter_since < t).astype(np.int8)
+
+    def team_roles(self, team_name, times, inclusive=False):
+        # int8 role of one team at every timestamp in times. With inclusive a
+        # fix sent at the very catch time already counts as hunting.
+        hunter_since = self.hunter_since[self.column(team_name)]
+        times = np.asarray(times)
+        hunter = hunter_since <= times if inclusive else hunter_since < times
+        return hunter.astype(np.int8)
+
+    def change_points(self):
+        # (time, team name) of every role change in chronological order,
+        # the initial hunter is not included
+        order = np.argsort(self.hunter_since, kind="stable")
+        return [
+            (int(self.hunter_since[i]), self.team_names[i])
+            for i in order if np.isfinite(self.hunter_since[i])
+        ]
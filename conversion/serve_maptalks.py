@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from game import parse_timestamps
+from track_pyramid import compute_meta, compute_pings, read_timeline
+
+try:
+    import brotli
+except ImportError:
+    # optional, without it only gzip variants are written and served
+    brotli = None
+
+# Local replacement for `python -m http.server` in maptalks/. Static files
+# are served with strong ETags and, if the client accepts them, the .br or
+# .gz variants written by --precompress. For every game directory there are
+# two endpoints:
+#   /api/<game>/meta                  users, getMeta values and pings
+#   /api/<game>/window?t0=...&t1=...  the points of [t0, t1] in the columnar
+#                                     interpol.json layout
+# so the viewer can start playing after the first window.
+ROOT = "maptalks"
+COMPRESSIBLE = {".html", ".js", ".json", ".css", ".svg"}
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+_static_files = dict()
+_games = dict()
+
+
+def precompress(root):
+    # Writes <file>.gz and, with brotli installed, <file>.br next to every
+    # compressible file that changed since its variants were written
+    count = 0
+    for path in Path(root).rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE:
+            continue
+        content = None
+        for encoding, suffix in ENCODINGS:
+            if encoding == "br" and brotli is None:
+                continue
+            variant = path.with_name(path.name + suffix)
+            if variant.exists() and variant.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+                continue
+            if content is None:
+                content = path.read_bytes()
+            if encoding == "br":
+                variant.write_bytes(brotli.compress(content, quality=11))
+            else:
+                variant.write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+            count += 1
+    return count
+
+
+def compress(body, encoding):
+    # On the fly compression for api responses
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    return body
+
+
+def etag_of(content, encoding=None):
+    # strong etags differ between the encodings of the same content
+    digest = hashlib.sha256(content).hexdigest()[:32]
+    return f'"{digest}-{encoding}"' if encoding is not None else f'"{digest}"'
+
+
+def accepted_encodings(accept_encoding):
+    # Content codings of an Accept-Encoding header with their q-values, a
+    # malformed q-value counts as 0
+    accepted = dict()
+    for token in accept_encoding.split(","):
+        coding, *parameters = [part.strip() for part in token.split(";")]
+        q = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding != "":
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding, available):
+    # First of the available encodings, in order of preference, the client
+    # accepts with a q-value above 0. "*" stands for the codings not listed.
+    accepted = accepted_encodings(accept_encoding)
+    return next((encoding for encoding in available if accepted.get(encoding, accepted.get("*", 0)) > 0), None)
+
+
+def load_static(path):
+    # Content and etag of a file and of its precompressed variants, cached
+    # until the file changes
+    stat = path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _static_files.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    content = path.read_bytes()
+    representations = {None: (content, etag_of(content))}
+    for encoding, suffix in ENCODINGS:
+        variant = path.with_name(path.name + suffix)
+        if variant.exists() and variant.stat().st_mtime_ns >= stat.st_mtime_ns:
+            representations[encoding] = (variant.read_bytes(), etag_of(content, encoding))
+    _static_files[path] = (key, representations)
+    return representations
+
+
+class GameWindows:
+    # The points of a viewer game directory as sorted arrays per user, sliced
+    # with binary searches
+    def __init__(self, directory):
+        self.timeline = read_timeline(f"{directory}/interpol.json")
+        self.meta = compute_meta(self.timeline)
+        with open(f"{directory}/team_caught.json") as file:
+            team_caught = json.load(file)
+        # like getCatchTimes in script.js, the initial hunter hunts from the start
+        catch_times = dict(zip(
+            [entry["runaway_active_user"] for entry in team_caught],
+            parse_timestamps([entry["timestamp"] for entry in team_caught]).tolist(),
+        ))
+        if len(team_caught) > 0:
+            catch_times[team_caught[-1]["hunter_active_user"]] = self.meta["minTime"]
+        self.info = {
+            "users": list(self.timeline),
+            "meta": self.meta,
+            "pings": compute_pings(self.timeline, self.meta, catch_times),
+        }
+
+    def window(self, t0, t1):
+        # Points with t0 <= time <= t1 plus the last point before and the
+        # first point after, so positions can be interpolated up to the edges
+        teams = dict()
+        for user, track in self.timeline.items():
+            first = max(np.searchsorted(track["time"], t0, side="left") - 1, 0)
+            last = min(np.searchsorted(track["time"], t1, side="right") + 1, len(track["time"]))
+            teams[user] = {name: column[first:last].tolist() for name, column in track.items()}
+        return {"format": "columnar", "start": t0, "end": t1, "teams": teams}
+
+
+def load_game(directory):
+    key = os.stat(f"{directory}/interpol.json").st_mtime_ns
+    cached = _games.get(directory)
+    if cached is None or cached[0] != key:
+        _games[directory] = (key, GameWindows(directory))
+    return _games[directory][1]
+
+
+def respond_api(root, parts, query, headers):
+    if len(parts) != 3 or parts[1] in ("", ".", "..") or not os.path.isfile(f"{root}/{parts[1]}/interpol.json"):
+        return 404, {}, b"not found"
+    game = load_game(f"{root}/{parts[1]}")
+    if parts[2] == "meta":
+        data = game.info
+    elif parts[2] == "window":
+        try:
+            t0 = int(query["t0"][0])
+            t1 = int(query["t1"][0])
+        except (KeyError, ValueError):
+            return 400, {}, b"t0 and t1 are required"
+        data = game.window(t0, t1)
+    else:
+        return 404, {}, b"not found"
+    body = json.dumps(data, separators=(",", ":")).encode()
+    available = [encoding for encoding, _ in ENCODINGS if encoding != "br" or brotli is not None]
+    encoding = choose_encoding(headers.get("accept-encoding", ""), available)
+    etag = etag_of(body, encoding)
+    response_headers = {"Content-Type": "application/json", "Cache-Control": "no-cache", "Vary": "Accept-Encoding", "ETag": etag}
+    if encoding is not None:
+        response_headers["Content-Encoding"] = encoding
+    if etag in headers.get("if-none-match", ""):
+        return 304, response_headers, b""
+    return 200, response_headers, compress(body, encoding)
+
+
+def respond_static(root, path, headers):
+    file_path = (Path(root) / path.lstrip("/")).resolve()
+    if file_path.is_dir():
+        file_path = file_path / "index.html"
+    if Path(root).resolve() not in file_path.parents or not file_path.is_file() or file_path.suffix in (".gz", ".br"):
+        return 404, {}, b"not found"
+    representations = load_static(file_path)
+    encoding = choose_encoding(headers.get("accept-encoding", ""), [encoding for encoding, _ in ENCODINGS if encoding in representations])
+    content, etag = representations[encoding]
+    response_headers = {
+        "Content-Type": mimetypes.guess_type(file_path.name)[0] or "application/octet-stream",
+        # revalidated on every load, which is cheap with the etag
+        "Cache-Control": "no-cache",
+        "ETag": etag,
+    }
+    if len(representations) > 1:
+        response_headers["Vary"] = "Accept-Encoding"
+    if encoding is not None:
+        response_headers["Content-Encoding"] = encoding
+    if etag in headers.get("if-none-match", ""):
+        return 304, response_headers, b""
+    return 200, response_headers, content
+
+
+def respond(root, method, target, headers):
+    if method not in ("GET", "HEAD"):
+        return 405, {"Allow": "GET, HEAD"}, b"method not allowed"
+    url = urlsplit(target)
+    path = unquote(url.path)
+    parts = path.strip("/").split("/")
+    if parts[0] == "api":
+        return respond_api(root, parts, parse_qs(url.query), headers)
+    return respond_static(root, path, headers)
+
+
+async def handle_connection(root, reader, writer):
+    # Minimal HTTP/1.1 with keep-alive, enough for a browser on localhost
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            method, target, version = request_line.decode("latin-1").split()
+            headers = dict()
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            # file reads and json slicing run in a thread, the loop keeps
+            # serving other connections
+            status, response_headers, body = await asyncio.to_thread(respond, root, method, target, headers)
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            response_headers["Content-Length"] = str(len(body))
+            response_headers["Connection"] = "keep-alive" if keep_alive else "close"
+            head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n" + "".join(f"{name}: {value}\r\n" for name, value in response_headers.items()) + "\r\n"
+            writer.write(head.encode("latin-1"))
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+            print(method, target, status, len(body))
+            if not keep_alive:
+                break
+    except (ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(root, host, port):
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(root, reader, writer), host, port)
+    print(f"serving {root} on http://{host}:{port}/")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the maptalks viewer with precompressed files and a time window api")
+    parser.add_argument("--root", default=ROOT, help="directory to serve")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--precompress", action="store_true", help="write the .gz (and .br) variants of the files and exit")
+    args = parser.parse_args()
+    if args.precompress:
+        print(f"{precompress(args.root)} files compressed")
+    else:
+        asyncio.run(serve(args.root, args.host, args.port))
@@ -1,19 +1,131 @@
+import argparse
+import itertools
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
+import build_cache
+import instrumentation
 
-for subdir in os.listdir("data/"):
-    with open(f"data/{subdir}/log-export/regular_status_update.json") as file:
-        data = json.load(file)
 
-    by_user = {}
+def iter_json_array(path, chunk_size=1 << 16):
+    # Yields the entries of a top-level json array one by one, so only the
+    # current chunk and the entry being decoded are held in memory
+    decoder = json.JSONDecoder()
+    with open(path) as file:
+        buffer = ""
+        position = 0
+        eof = False
+        started = False
 
-    for entry in data:
-        user = entry["active_user"]
-        if user not in by_user:
-            by_user[user] = []
-        by_user[user].append(entry)
+        def fill():
+            nonlocal buffer, position, eof
+            chunk = file.read(chunk_size)
+            if chunk == "":
+                eof = True
+            buffer = buffer[position:] + chunk
+            position = 0
 
-    for user, data in by_user.items():
-        with open(f"data/{subdir}/log-by-user/{user}.json", "w") as file:
-            json.dump(data, file, indent=4)
+        while True:
+            while position < len(buffer) and (buffer[position].isspace() or (started and buffer[position] == ",")):
+                position += 1
+            if position == len(buffer):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of json array")
+                fill()
+                continue
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError(f"{path}: expected a json array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                return
+            try:
+                entry, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # A number at the chunk border might continue in the next chunk
+                fill()
+                continue
+            position = end
+            yield entry
+
+
+class ShardWriter:
+    # Appends entries to one json array file per user while the export is
+    # being read. With indent=4 the output matches json.dump(entries, indent=4)
+    def __init__(self, directory, indent=4):
+        self.directory = directory
+        self.indent = indent
+        self.files = dict()
+        Path(directory).mkdir(parents=True, exist_ok=True)
+
+    def write(self, user, entry):
+        if user not in self.files:
+            self.files[user] = open(f"{self.directory}/{user}.json", "w")
+            separator = "[\n" if self.indent is not None else "["
+        else:
+            separator = ",\n" if self.indent is not None else ","
+        if self.indent is not None:
+            prefix = " " * self.indent
+            text = json.dumps(entry, indent=self.indent)
+            text = "\n".join(prefix + line for line in text.split("\n"))
+        else:
+            text = json.dumps(entry, separators=(",", ":"))
+        self.files[user].write(separator + text)
+
+    def close(self):
+        for file in self.files.values():
+            file.write("\n]" if self.indent is not None else "]")
+            file.close()
+        self.files.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def split_game(game_name, indent=4, force=False):
+    export_path = "log-export/regular_status_update.json"
+    digest = build_cache.stage_hash(game_name, [export_path], {"indent": indent})
+    if not force and build_cache.is_up_to_date(game_name, "split_teams", digest):
+        print(f"{game_name}: split_teams up to date")
+        return
+    users = set()
+    with instrumentation.stage("split_teams", game_name) as record, ShardWriter(f"data/{game_name}/log-by-user", indent) as writer:
+        record["rows"] = 0
+        for entry in iter_json_array(f"data/{game_name}/{export_path}"):
+            users.add(entry["active_user"])
+            writer.write(entry["active_user"], entry)
+            record["rows"] += 1
+    build_cache.record_stage(game_name, "split_teams", digest, [f"log-by-user/{user}.json" for user in users])
+
+
+def main(jobs=1, indent=4, force=False):
+    game_names = sorted(os.listdir("data/"))
+    if jobs == 1:
+        for game_name in game_names:
+            split_game(game_name, indent, force)
+    else:
+        with ProcessPoolExecutor(jobs) as executor:
+            list(executor.map(split_game, game_names, itertools.repeat(indent), itertools.repeat(force)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split the status update export of every game by user")
+    parser.add_argument("--jobs", type=int, default=1, help="number of games processed in parallel")
+    parser.add_argument("--compact", action="store_true", help="write json without indentation")
+    parser.add_argument("--force", action="store_true", help="rebuild games even if their export is unchanged")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+    main(jobs=args.jobs, indent=None if args.compact else 4, force=args.force)
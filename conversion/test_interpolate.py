@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from interpolate import connection_status
+from trajectories import Trajectories
+
+
+def connection_status_loop(time_equi, teams, inactive_after_ms):
+    # The nested loop connection_status replaced, kept as the reference
+    active_connection = np.empty((len(time_equi), len(teams)), dtype=bool)
+    for column, team_dataframe in enumerate(teams.values()):
+        time_raw = team_dataframe.index
+        current_raw_index = 0
+        for i, t in enumerate(time_equi):
+            while current_raw_index+1 < len(time_raw) and time_raw[current_raw_index+1] < t:
+                current_raw_index += 1
+            assert time_raw[current_raw_index] <= t
+            active_connection[i, column] = t - time_raw[current_raw_index] <= inactive_after_ms
+    return active_connection
+
+
+def make_teams(raw_times):
+    return {
+        f"team{i}": pd.DataFrame({"lat": np.zeros(len(times)), "lon": np.zeros(len(times))}, index=np.asarray(times, dtype=np.int64))
+        for i, times in enumerate(raw_times)
+    }
+
+
+def check(time_equi, raw_times, inactive_after_ms):
+    teams = make_teams(raw_times)
+    trajectories = Trajectories(time_equi, teams.keys())
+    connection_status(trajectories, teams, inactive_after_ms)
+    expected = connection_status_loop(np.asarray(time_equi, dtype=np.int64), teams, inactive_after_ms)
+    np.testing.assert_array_equal(trajectories.connection, expected)
+    return trajectories.connection
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_tracks(seed):
+    rng = np.random.default_rng(seed)
+    time_step_ms = int(rng.choice([1_000, 5_000, 7_000]))
+    inactive_after_ms = int(rng.choice([5_000, 30_000, 60_000]))
+    raw_times = []
+    for _ in range(rng.integers(1, 6)):
+        gaps = rng.choice([500, 3_000, 10_000, 120_000], size=rng.integers(2, 200), p=[0.3, 0.4, 0.25, 0.05])
+        raw_times.append(np.cumsum(gaps))
+    start = max(times[0] for times in raw_times)
+    end = min(times[-1] for times in raw_times)
+    check(np.arange(start, end, time_step_ms), raw_times, inactive_after_ms)
+
+
+def test_fix_on_grid_point():
+    # a fix at exactly the grid time is not before it, the previous fix counts
+    connection = check(np.arange(0, 40_000, 10_000), [[0, 10_000, 40_000]], 10_000)
+    assert connection[:, 0].tolist() == [True, True, True, False]
+
+
+def test_single_fix():
+    connection = check(np.arange(0, 50_000, 10_000), [[0]], 20_000)
+    assert connection[:, 0].tolist() == [True, True, True, False, False]
+
+
+def test_gap_longer_than_inactive_after():
+    connection = check(np.arange(0, 100_000, 5_000), [[0, 5_000, 10_000, 80_000, 85_000, 95_000]], 30_000)
+    assert connection[:, 0].tolist() == [True] * 9 + [False] * 8 + [True] * 3
+
+
+def test_first_fix_after_grid_start():
+    # grid points before the first fix of a team have no fix to look back
+    # to, both versions reject them
+    teams = make_teams([[0, 5_000, 10_000], [3_000, 8_000]])
+    time_equi = np.arange(0, 10_000, 1_000)
+    with pytest.raises(AssertionError):
+        connection_status_loop(time_equi, teams, 30_000)
+    with pytest.raises(AssertionError):
+        connection_status(Trajectories(time_equi, teams.keys()), teams, 30_000)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import kinematics
+from proximity import EARTH_RADIUS_IN_METERS
+
+
+def cumulative_distance_loop(lat, lon):
+    # The per team make_cumulative_distance the chunked version replaced,
+    # kept as the reference
+    cumulative = np.empty(lat.shape)
+    for column in range(lat.shape[1]):
+        lat_column = np.deg2rad(np.ascontiguousarray(lat[:, column]))
+        lon_column = np.deg2rad(np.ascontiguousarray(lon[:, column]))
+        x = EARTH_RADIUS_IN_METERS * np.cos(lat_column) * np.cos(lon_column)
+        y = EARTH_RADIUS_IN_METERS * np.cos(lat_column) * np.sin(lon_column)
+        z = EARTH_RADIUS_IN_METERS * np.sin(lat_column)
+        diff_x = np.zeros_like(x)
+        diff_y = np.zeros_like(y)
+        diff_z = np.zeros_like(z)
+        diff_x[1:] = x[1:] - x[:-1]
+        diff_y[1:] = y[1:] - y[:-1]
+        diff_z[1:] = z[1:] - z[:-1]
+        np.cumsum(np.hypot(diff_x, np.hypot(diff_y, diff_z)), out=cumulative[:, column])
+    return cumulative
+
+
+def weighted_step_distance_loop(cumulative, num_points):
+    # The per team make_average_speed the chunked version replaced. For games
+    # shorter than the kernel "same" mode returns num_points values, the
+    # middle of the full convolution is what the chunked version computes.
+    kernel = np.arange(num_points)
+    kernel = kernel / np.sum(kernel)
+    speed = np.empty(cumulative.shape)
+    distance = np.zeros(len(cumulative))
+    for column in range(cumulative.shape[1]):
+        distance[1:] = cumulative[1:, column] - cumulative[:-1, column]
+        if len(distance) >= num_points:
+            speed[:, column] = np.convolve(distance, kernel, mode="same")
+        else:
+            start = (num_points - 1) // 2
+            speed[:, column] = np.convolve(distance, kernel, mode="full")[start:start + len(distance)]
+    return speed
+
+
+def make_tracks(seed, rows, teams):
+    # random walks of a few meters per grid step around Regensburg
+    rng = np.random.default_rng(seed)
+    lat = 49.0 + np.cumsum(rng.normal(0, 2e-5, size=(rows, teams)), axis=0)
+    lon = 12.1 + np.cumsum(rng.normal(0, 3e-5, size=(rows, teams)), axis=0)
+    return lat, lon
+
+
+@pytest.mark.parametrize("rows", [1, 2, 5, 40, 1_000])
+@pytest.mark.parametrize("chunk_size", [1, 3, None])
+def test_cumulative_distance(rows, chunk_size):
+    lat, lon = make_tracks(rows, rows, 4)
+    cumulative = np.empty(lat.shape)
+    kinematics.cumulative_distance(lat, lon, cumulative, chunk_size)
+    np.testing.assert_array_equal(cumulative, cumulative_distance_loop(lat, lon))
+
+
+@pytest.mark.parametrize("rows", [1, 2, 5, 12, 13, 40, 1_000])
+@pytest.mark.parametrize("num_points", [2, 3, 12, 13])
+@pytest.mark.parametrize("chunk_size", [1, 3, None])
+def test_weighted_step_distance(rows, num_points, chunk_size):
+    lat, lon = make_tracks(rows, rows, 4)
+    cumulative = cumulative_distance_loop(lat, lon)
+    speed = np.empty(cumulative.shape)
+    kinematics.weighted_step_distance(cumulative, num_points, speed, chunk_size)
+    # convolve1d sums in another order than np.convolve
+    np.testing.assert_allclose(speed, weighted_step_distance_loop(cumulative, num_points), rtol=1e-12, atol=1e-12)
+
+
+def test_chunks_smaller_than_the_kernel():
+    # every chunk needs rows of both neighbours, with chunks of one row the
+    # halo spans several chunks
+    lat, lon = make_tracks(0, 100, 3)
+    cumulative = cumulative_distance_loop(lat, lon)
+    expected = weighted_step_distance_loop(cumulative, 12)
+    for chunk_size in range(1, 15):
+        speed = np.empty(cumulative.shape)
+        kinematics.weighted_step_distance(cumulative, 12, speed, chunk_size)
+        np.testing.assert_allclose(speed, expected, rtol=1e-12, atol=1e-12)
@@ -0,0 +1,224 @@
+import argparse
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from encounters import project
+from game import Game
+import instrumentation
+
+# specify game
+GAME = "hackaburg-campuswiese"
+
+# Levels of the pyramid from full to coarse resolution. The viewer uses the
+# coarsest level whose min_speed is not above the playback speed. Tracks are
+# simplified until no dropped point is more than tolerance_m meters away from
+# the position the viewer interpolates at its time, and every level is split
+# into chunks of chunk_ms.
+LEVELS = [
+    {"tolerance_m": 0, "chunk_ms": 10 * 60_000, "min_speed": 0},
+    {"tolerance_m": 1, "chunk_ms": 20 * 60_000, "min_speed": 60},
+    {"tolerance_m": 3, "chunk_ms": 60 * 60_000, "min_speed": 120},
+    {"tolerance_m": 8, "chunk_ms": 120 * 60_000, "min_speed": 240},
+]
+
+# same interval as the pings of the viewer
+PING_INTERVAL_MS = 5 * 60 * 1000
+
+# decimal places of the coordinates, about 1 cm
+COORDINATE_DECIMALS = 7
+
+
+def load_timeline(game_name):
+    return read_timeline(f"data/{game_name}/log-interpol/interpol.json")
+
+
+def read_timeline(path):
+    # Merged raw and interpolated points of an interpol.json (both layouts)
+    # as columnar numpy arrays per user, sorted by time like the viewer does
+    with open(path) as file:
+        data = json.load(file)
+    if isinstance(data, dict):
+        columns_by_user = data["teams"]
+    else:
+        columns_by_user = dict()
+        for entry in data:
+            columns = columns_by_user.setdefault(entry["active_user"], {
+                "time": [], "lat": [], "lon": [], "game_state": [], "is_connection_active": [], "is_interpolated": [],
+            })
+            columns["time"].append(entry["current_location"]["timestamp"])
+            columns["lat"].append(entry["current_location"]["lat"])
+            columns["lon"].append(entry["current_location"]["lon"])
+            columns["game_state"].append(entry["game_state"])
+            columns["is_connection_active"].append(entry.get("is_connection_active", True))
+            columns["is_interpolated"].append(entry["is_interpolated"])
+
+    timeline = dict()
+    for user, columns in columns_by_user.items():
+        order = np.argsort(np.asarray(columns["time"], dtype=np.int64), kind="stable")
+        timeline[user] = {
+            "time": np.asarray(columns["time"], dtype=np.int64)[order],
+            "lat": np.asarray(columns["lat"], dtype=np.float64)[order],
+            "lon": np.asarray(columns["lon"], dtype=np.float64)[order],
+            "game_state": np.asarray(columns["game_state"], dtype=str)[order],
+            "is_connection_active": np.asarray(columns["is_connection_active"], dtype=bool)[order],
+            "is_interpolated": np.asarray(columns["is_interpolated"], dtype=bool)[order],
+        }
+    return timeline
+
+
+def simplify(time, x, y, tolerance_m, keep=None):
+    # Douglas-Peucker on (time, x, y) points with the synchronized distance:
+    # the error of a dropped point is its distance in meters to the position
+    # linearly interpolated at its time between the kept neighbours, which is
+    # what the viewer shows. keep marks points that must not be dropped, the
+    # segments between them are simplified independently. Returns the mask of
+    # the kept points.
+    kept = np.zeros(len(time), dtype=bool) if keep is None else keep.copy()
+    if len(time) == 0:
+        return kept
+    kept[0] = kept[-1] = True
+    anchors = np.flatnonzero(kept)
+    stack = list(zip(anchors[:-1], anchors[1:]))
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner = slice(start + 1, end)
+        duration = time[end] - time[start]
+        factor = (time[inner] - time[start]) / duration if duration > 0 else np.zeros(end - start - 1)
+        error = np.hypot(
+            x[inner] - (x[start] + factor * (x[end] - x[start])),
+            y[inner] - (y[start] + factor * (y[end] - y[start])),
+        )
+        worst = int(np.argmax(error))
+        if error[worst] > tolerance_m:
+            split = start + 1 + worst
+            kept[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return kept
+
+
+def state_changes(track):
+    # Points where the game state or the connection status changes. The
+    # viewer takes both from the previous point, so keeping these reproduces
+    # them exactly.
+    changed = np.zeros(len(track["time"]), dtype=bool)
+    changed[1:] = (track["game_state"][1:] != track["game_state"][:-1]) | (track["is_connection_active"][1:] != track["is_connection_active"][:-1])
+    return changed
+
+
+def chunk_columns(track, mask, start, end):
+    # Points of the chunk [start, end) plus the last point before and the
+    # first point after it, so positions at the chunk borders can be
+    # interpolated without loading the neighbouring chunks
+    indices = np.flatnonzero(mask)
+    times = track["time"][indices]
+    first = max(np.searchsorted(times, start, side="left") - 1, 0)
+    last = min(np.searchsorted(times, end, side="left") + 1, len(indices))
+    indices = indices[first:last]
+    return {
+        "time": track["time"][indices].tolist(),
+        "lat": np.round(track["lat"][indices], COORDINATE_DECIMALS).tolist(),
+        "lon": np.round(track["lon"][indices], COORDINATE_DECIMALS).tolist(),
+        "game_state": track["game_state"][indices].tolist(),
+        "is_connection_active": track["is_connection_active"][indices].tolist(),
+    }
+
+
+def compute_meta(timeline):
+    # Same values as getMeta in maptalks/script.js
+    time = np.concatenate([track["time"] for track in timeline.values()])
+    lat = np.concatenate([track["lat"] for track in timeline.values()])
+    lon = np.concatenate([track["lon"] for track in timeline.values()])
+    game_state = np.concatenate([track["game_state"] for track in timeline.values()])
+    running = time[game_state == "RUNNING"]
+    over = time[game_state == "OVER"]
+    return {
+        "centerLat": float((lat.min() + lat.max()) / 2),
+        "centerLon": float((lon.min() + lon.max()) / 2),
+        "minTime": int(time.min()),
+        "maxTime": int(time.max()),
+        "minRunningTime": int(running.min()) if len(running) > 0 else None,
+        "maxRunningTime": int(over.min()) if len(over) > 0 else None,
+    }
+
+
+def compute_pings(timeline, meta, catch_times):
+    # Same pings as getPings in maptalks/script.js: every PING_INTERVAL_MS the
+    # last raw fix of every team that is still running away
+    if meta["minRunningTime"] is None:
+        return []
+    end = meta["maxRunningTime"] if meta["maxRunningTime"] is not None else meta["maxTime"]
+    ping_times = np.arange(meta["minRunningTime"] + PING_INTERVAL_MS, end, PING_INTERVAL_MS)
+    pings = [{"time": int(ping), "locations": dict()} for ping in ping_times]
+    for user, track in timeline.items():
+        raw = ~track["is_interpolated"]
+        time = track["time"][raw]
+        # first raw fix after every ping
+        after = np.searchsorted(time, ping_times, side="right")
+        for ping, index in zip(pings, after.tolist()):
+            if index == 0 or index == len(time):
+                continue
+            if user in catch_times and time[index] >= catch_times[user]:
+                continue
+            ping["locations"][user] = {"lat": float(track["lat"][raw][index - 1]), "lon": float(track["lon"][raw][index - 1])}
+    return pings
+
+
+def write_pyramid(game_name, levels=LEVELS):
+    # Writes data/<game>/pyramid/index.json and the chunks of every level to
+    # data/<game>/pyramid/<level>/<chunk>.json
+    pyramid_dir = f"data/{game_name}/pyramid"
+    shutil.rmtree(pyramid_dir, ignore_errors=True)
+    timeline = load_timeline(game_name)
+    meta = compute_meta(timeline)
+    index = {
+        "format": "pyramid",
+        "users": list(timeline),
+        "meta": meta,
+        "pings": compute_pings(timeline, meta, Game.load(game_name).catch_times()),
+        "levels": [],
+    }
+
+    for level_number, level in enumerate(levels):
+        with instrumentation.stage("track_pyramid_level", game_name, level_number) as record:
+            masks = dict()
+            for user, track in timeline.items():
+                x, y = project(track["lat"], track["lon"])
+                masks[user] = simplify(track["time"], x, y, level["tolerance_m"], state_changes(track))
+            record["rows"] = sum(int(mask.sum()) for mask in masks.values())
+
+            Path(f"{pyramid_dir}/{level_number}").mkdir(parents=True, exist_ok=True)
+            level_index = {**level, "points": record["rows"], "chunks": []}
+            first_chunk = meta["minTime"] // level["chunk_ms"] * level["chunk_ms"]
+            for chunk_number, start in enumerate(range(first_chunk, meta["maxTime"] + 1, level["chunk_ms"])):
+                end = start + level["chunk_ms"]
+                path = f"{level_number}/{chunk_number}.json"
+                teams = {user: chunk_columns(track, masks[user], start, end) for user, track in timeline.items()}
+                with open(f"{pyramid_dir}/{path}", "w") as file:
+                    json.dump({"start": start, "end": end, "teams": teams}, file, separators=(",", ":"))
+                level_index["chunks"].append({"start": start, "end": end, "path": path})
+            index["levels"].append(level_index)
+
+    with open(f"{pyramid_dir}/index.json", "w") as file:
+        json.dump(index, file, separators=(",", ":"))
+    return index
+
+
+def main(game_names):
+    for game_name in game_names:
+        index = write_pyramid(game_name)
+        print(game_name, [level["points"] for level in index["levels"]])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write multi-resolution track chunks of interpolated games for the maptalks viewer")
+    parser.add_argument("--game", nargs="+", default=[GAME], help="game directories in data/")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure(args)
+    main(args.game)
@@ -0,0 +1,165 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import kinematics
+
+FIELDS = ["lat", "lon", "distance", "speed"]
+
+# trajectory store written by interpolate.py, relative to the game directory
+STORE_PATH = "log-interpol/trajectories"
+
+# grid positions of every game, committed unlike the store
+INTERPOL_PATH = "log-interpol/interpol.parquet"
+
+
+class Trajectories:
+    # Interpolated state of all teams of a game on the common time grid.
+    # Everything is allocated once: values is a contiguous (time, team, field)
+    # float64 array with the fields in FIELDS, connection a (time, team) bool
+    # mask. The pipeline stages write into the field views in place.
+    def __init__(self, time, team_names):
+        self.time = np.asarray(time, dtype=np.int64)
+        self.team_names = list(team_names)
+        self.values = np.zeros((len(self.time), len(self.team_names), len(FIELDS)), dtype=np.float64)
+        self.connection = np.ones((len(self.time), len(self.team_names)), dtype=bool)
+        self._store = None
+
+    @classmethod
+    def from_interpol_dataframe(cls, df):
+        # From the layout of log-interpol/interpol.parquet, distance and speed
+        # stay 0
+        team_names = list(dict.fromkeys(c[0] for c in df.columns))
+        trajectories = cls(df.index.to_numpy(), team_names)
+        trajectories.lat[:] = df.loc[:, (team_names, "lat")].to_numpy()
+        trajectories.lon[:] = df.loc[:, (team_names, "lon")].to_numpy()
+        return trajectories
+
+    def save(self, directory):
+        # Writes values and connection as .npy files next to grid.json, which
+        # describes the uniform time grid, so open() can memory-map them
+        if len(self.time) > 2 and np.any(np.diff(self.time) != self.step):
+            raise ValueError("trajectories can only be stored on a uniform time grid")
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        np.save(f"{directory}/values.npy", self.values)
+        np.save(f"{directory}/connection.npy", self.connection)
+        grid = {"start": self.start, "step": self.step, "length": len(self.time), "team_names": self.team_names, "fields": FIELDS}
+        with open(f"{directory}/grid.json", "w") as file:
+            json.dump(grid, file, indent=4)
+
+    @classmethod
+    def open(cls, directory, rows=slice(None)):
+        # Memory-maps a store written by save(). Nothing but grid.json is read
+        # up front, rows are paged in when they are accessed.
+        with open(f"{directory}/grid.json") as file:
+            grid = json.load(file)
+        trajectories = cls.__new__(cls)
+        trajectories.time = (grid["start"] + grid["step"] * np.arange(grid["length"], dtype=np.int64))[rows]
+        trajectories.team_names = grid["team_names"]
+        trajectories.values = np.load(f"{directory}/values.npy", mmap_mode="r")[rows]
+        trajectories.connection = np.load(f"{directory}/connection.npy", mmap_mode="r")[rows]
+        trajectories._store = (directory, rows)
+        return trajectories
+
+    @classmethod
+    def load(cls, game_name):
+        # The store of the game if interpolate.py wrote one, otherwise the
+        # positions of interpol.parquet in memory with the cumulative distance
+        # computed again, speed stays 0. None if there is neither.
+        directory = f"data/{game_name}/{STORE_PATH}"
+        if os.path.exists(f"{directory}/grid.json"):
+            return cls.open(directory)
+        if not os.path.exists(f"data/{game_name}/{INTERPOL_PATH}"):
+            return None
+        trajectories = cls.from_interpol_dataframe(pd.read_parquet(f"data/{game_name}/{INTERPOL_PATH}"))
+        kinematics.cumulative_distance(trajectories.lat, trajectories.lon, trajectories.distance)
+        return trajectories
+
+    def __getstate__(self):
+        # Stores are sent to worker processes by path instead of by value
+        if self._store is not None:
+            return {"store": self._store}
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if "store" in state:
+            self.__dict__.update(Trajectories.open(*state["store"]).__dict__)
+        else:
+            self.__dict__.update(state)
+
+    @property
+    def start(self):
+        return int(self.time[0])
+
+    @property
+    def step(self):
+        return int(self.time[1] - self.time[0]) if len(self.time) > 1 else 1
+
+    @property
+    def lat(self):
+        return self.values[:, :, FIELDS.index("lat")]
+
+    @property
+    def lon(self):
+        return self.values[:, :, FIELDS.index("lon")]
+
+    @property
+    def distance(self):
+        return self.values[:, :, FIELDS.index("distance")]
+
+    @property
+    def speed(self):
+        return self.values[:, :, FIELDS.index("speed")]
+
+    def column(self, team_name):
+        return self.team_names.index(team_name)
+
+    def rows_at(self, times):
+        # Nearest grid row of every timestamp, clamped to the grid
+        rows = np.rint((np.asarray(times, dtype=np.float64) - self.start) / self.step).astype(np.int64)
+        return np.clip(rows, 0, len(self.time) - 1)
+
+    def positions_at(self, times):
+        # (time, team, 2) lat/lon at arbitrary timestamps, linear between the
+        # two neighbouring grid rows and clamped to the grid. Only those rows
+        # are read.
+        position = np.clip((np.asarray(times, dtype=np.float64) - self.start) / self.step, 0, len(self.time) - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, len(self.time) - 1)
+        factor = (position - lower)[:, None, None]
+        lower_positions = self.values[lower, :, :2]
+        return lower_positions + factor * (self.values[upper, :, :2] - lower_positions)
+
+    def window(self, t0, t1):
+        # Trajectories of the grid times in [t0, t1), a view without copies
+        first, last = np.clip(-(-(np.array([t0, t1]) - self.start) // self.step), 0, len(self.time))
+        if self._store is not None:
+            directory, rows = self._store
+            offset = rows.start or 0
+            return Trajectories.open(directory, slice(offset + first, offset + last))
+        window = Trajectories.__new__(Trajectories)
+        window.time = self.time[first:last]
+        window.team_names = self.team_names
+        window.values = self.values[first:last]
+        window.connection = self.connection[first:last]
+        window._store = None
+        return window
+
+    def interpol_dataframe(self):
+        # Same layout as log-interpol/interpol.parquet
+        columns = pd.MultiIndex.from_product([self.team_names, ["lat", "lon"]], names=["team_name", "dim"])
+        positions = self.values[:, :, :2].reshape(len(self.time), -1)
+        return pd.DataFrame(positions, index=self.time, columns=columns)
+
+    def connection_dataframe(self):
+        # Same layout as log-interpol/connection.parquet
+        return pd.DataFrame(self.connection, index=self.time, columns=self.team_names)
+
+    def distance_dataframe(self):
+        return pd.DataFrame(self.distance, index=self.time, columns=self.team_names)
+
+    def speed_dataframe(self):
+        return pd.DataFrame(self.speed, index=self.time, columns=self.team_names)
@@ -0,0 +1,130 @@
+# import required packages
+import os
+import sys
+import numpy as np
+import imageio
+
+# the role timeline is shared with the conversion scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "conversion"))
+from roles import HUNTER
+
+TILE_SIZE = 256
+BACKGROUND_COLOR = (242, 242, 240)
+ROLE_COLORS = {'hunter': (255, 0, 0), 'chased': (0, 128, 0)}
+# highest zoom level slippy map tiles are usually available at
+MAX_ZOOM = 18
+
+
+# Web mercator pixel coordinates at the given zoom level
+def lat_lon_to_pixel(lat, lon, zoom):
+    scale = TILE_SIZE * 2 ** zoom
+    lat = np.deg2rad(lat)
+    x = (np.asarray(lon) + 180) / 360 * scale
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * scale
+    return x, y
+
+
+# Rasterize the background once, from slippy map tiles stored as
+# {tile_dir}/{zoom}/{x}/{y}.png if available, otherwise a plain canvas
+def load_basemap(left, top, width, height, zoom, tile_dir=None):
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:, :] = BACKGROUND_COLOR
+    if tile_dir is None:
+        return image
+    for tile_x in range(left // TILE_SIZE, (left + width - 1) // TILE_SIZE + 1):
+        for tile_y in range(top // TILE_SIZE, (top + height - 1) // TILE_SIZE + 1):
+            path = os.path.join(tile_dir, str(zoom), str(tile_x), f"{tile_y}.png")
+            if not os.path.exists(path):
+                continue
+            tile = imageio.v2.imread(path)
+            if tile.ndim == 2:
+                tile = np.stack([tile] * 3, axis=-1)
+            tile = tile[:, :, :3]
+            # overlap of the tile with the image in image coordinates
+            x_0 = max(tile_x * TILE_SIZE - left, 0)
+            y_0 = max(tile_y * TILE_SIZE - top, 0)
+            x_1 = min((tile_x + 1) * TILE_SIZE - left, width)
+            y_1 = min((tile_y + 1) * TILE_SIZE - top, height)
+            tile_left = x_0 + left - tile_x * TILE_SIZE
+            tile_top = y_0 + top - tile_y * TILE_SIZE
+            image[y_0:y_1, x_0:x_1] = tile[tile_top:tile_top + y_1 - y_0, tile_left:tile_left + x_1 - x_0]
+    return image
+
+
+# Largest zoom level at which the pixel extent of lat/lon at zoom 0 fits into
+# width x height pixels minus margin on every side
+def fit_zoom(x, y, width, height, margin=0):
+    extent_x = max(np.nanmax(x) - np.nanmin(x), 1e-9)
+    extent_y = max(np.nanmax(y) - np.nanmin(y), 1e-9)
+    scale = min((width - 2 * margin) / extent_x, (height - 2 * margin) / extent_y)
+    return int(np.clip(np.floor(np.log2(scale)), 0, MAX_ZOOM))
+
+
+# Pixel offsets of a filled disk
+def disk_offsets(radius):
+    d = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(d, d, indexing="ij")
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+    return dy[inside], dx[inside]
+
+
+# Draw filled disks of one radius at all (x, y) positions in a single
+# indexed assignment, clipped to the image
+def draw_disks(image, x, y, colors, offsets):
+    dy, dx = offsets
+    rows = (np.rint(y).astype(np.int64)[:, None] + dy[None, :]).ravel()
+    cols = (np.rint(x).astype(np.int64)[:, None] + dx[None, :]).ravel()
+    pixel_colors = np.repeat(np.asarray(colors, dtype=np.uint8), len(dy), axis=0)
+    inside = (rows >= 0) & (rows < image.shape[0]) & (cols >= 0) & (cols < image.shape[1])
+    image[rows[inside], cols[inside]] = pixel_colors[inside]
+
+
+# Frame renderer for render_video.render_video that needs neither network
+# nor a browser. The basemap and the projected positions are computed on the
+# first frame of every worker process and reused for all later frames, each
+# frame only copies the basemap and draws trails and markers onto it. The
+# canvas is centered on the bounding box of all positions of the game, by
+# default at the largest zoom level at which the whole box fits.
+class RasterRenderer:
+    def __init__(self, tile_dir=None, zoom=None, width=720, height=720, marker_radius=9, trail_length=12, trail_step=2, trail_radius=3):
+        self.tile_dir = tile_dir
+        self.zoom = zoom
+        self.width = width
+        self.height = height
+        self.marker_radius = marker_radius
+        self.marker_offsets = disk_offsets(marker_radius)
+        self.trail_offsets = disk_offsets(trail_radius)
+        self.trail_length = trail_length
+        self.trail_step = trail_step
+        self._game = None
+
+    def _prepare(self, trajectories, teams, roles):
+        columns = [trajectories.column(team) for team in teams]
+        lat = trajectories.lat[:, columns]
+        lon = trajectories.lon[:, columns]
+        zoom = self.zoom
+        if zoom is None:
+            zoom = fit_zoom(*lat_lon_to_pixel(lat, lon, 0), self.width, self.height, self.marker_radius)
+        x, y = lat_lon_to_pixel(lat, lon, zoom)
+        # centered on the bounding box of all teams, like getMeta centers the
+        # maptalks viewer
+        left = int(round((np.nanmin(x) + np.nanmax(x)) / 2)) - self.width // 2
+        top = int(round((np.nanmin(y) + np.nanmax(y)) / 2)) - self.height // 2
+        basemap = load_basemap(left, top, self.width, self.height, zoom, self.tile_dir)
+        self._game = (trajectories.time, x - left, y - top, roles.matrix(trajectories.time), basemap)
+
+    def __call__(self, trajectories, teams, roles, t):
+        if self._game is None:
+            self._prepare(trajectories, teams, roles)
+        times, x, y, role_matrix, basemap = self._game
+        i = np.searchsorted(times, t)
+        colors = np.where((role_matrix[i] == HUNTER)[:, None], ROLE_COLORS['hunter'], ROLE_COLORS['chased'])
+
+        image = basemap.copy()
+        trail = np.arange(i - self.trail_step * self.trail_length, i, self.trail_step)
+        trail = trail[trail >= 0]
+        if len(trail) > 0:
+            trail_colors = np.tile((colors + 2 * np.array(BACKGROUND_COLOR)) // 3, (len(trail), 1))
+            draw_disks(image, x[trail].ravel(), y[trail].ravel(), trail_colors, self.trail_offsets)
+        draw_disks(image, x[i], y[i], colors, self.marker_offsets)
+        return image
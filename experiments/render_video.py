@@ -1,47 +1,67 @@
 # import required packages
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.io as pio
 import imageio
 from tqdm import tqdm
 
+# the role timeline is shared with the conversion scripts
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "conversion"))
+from roles import RoleTimeline, HUNTER
+from trajectories import Trajectories
+
+
+# The interpolated positions as Trajectories, either the interpol.parquet
+# dataframe or already a (memory-mapped) Trajectories
+def as_trajectories(df):
+    if isinstance(df, pd.DataFrame):
+        return Trajectories.from_interpol_dataframe(df)
+    return df
+
 
 # Plot data to figures
 def plot_figures(df, teams, initial_hunter, caught_timestamps, step=5):
     figs = []
+    trajectories = as_trajectories(df)
     
+    # Roles of all teams at all plotted timestamps
+    times = trajectories.time[::step]
+    role_matrix = RoleTimeline(teams, caught_timestamps, initial_hunter).matrix(times)
+
     # Loop through data
-    for t in tqdm(df.index[::step]):
-        # Get teams role
-        color = []
-        for team in teams:
-            if team == initial_hunter:
-                color.append('hunter')
-            elif team in caught_timestamps.keys():
-                if caught_timestamps[team] < t:
-                    color.append('hunter')
-                else:
-                    color.append('chased')
-            else:
-                color.append('chased')
-                
-        # Data to plot
-        data = {'lat': [df[team, 'lat'][t] for team in teams],
-                'lon': [df[team, 'lon'][t] for team in teams]}
-        df_plot = pd.DataFrame(data)
-    
-        # Color map
-        color_discrete_map = {'hunter': 'red', 'chased': 'green'}
-    
-        # Create plot
-        fig = px.scatter_mapbox(df_plot, lat="lat", lon="lon", color=color, color_discrete_map=color_discrete_map, size=[1] * len(teams), zoom=15, height=720, width=720)
-        fig.update_layout(mapbox_style="carto-positron", margin={"r": 0, "t": 0, "l": 0, "b": 0}, mapbox_center_lat=df[teams[0], 'lat'][df.index[0]], mapbox_center_lon=df[teams[0], 'lon'][df.index[0]], showlegend=False)
-        figs.append(fig)
+    for t, roles in tqdm(zip(times, role_matrix), total=len(times)):
+        figs.append(plot_figure(trajectories, teams, roles, t))
         
     # Return figures
     return figs
 
 
+# Plot the data of a single timestamp, roles holds the role code of every team
+def plot_figure(trajectories, teams, roles, t):
+    # Get teams role
+    color = np.where(roles == HUNTER, 'hunter', 'chased').tolist()
+
+    # Data to plot, only the rows around t are read
+    columns = [trajectories.column(team) for team in teams]
+    positions = trajectories.positions_at([t])[0, columns]
+    data = {'lat': positions[:, 0],
+            'lon': positions[:, 1]}
+    df_plot = pd.DataFrame(data)
+
+    # Color map
+    color_discrete_map = {'hunter': 'red', 'chased': 'green'}
+
+    # Create plot
+    fig = px.scatter_mapbox(df_plot, lat="lat", lon="lon", color=color, color_discrete_map=color_discrete_map, size=[1] * len(teams), zoom=15, height=720, width=720)
+    fig.update_layout(mapbox_style="carto-positron", margin={"r": 0, "t": 0, "l": 0, "b": 0}, mapbox_center_lat=trajectories.lat[0, columns[0]], mapbox_center_lon=trajectories.lon[0, columns[0]], showlegend=False)
+    return fig
+
+
 # Convert figures to video frames
 def figs_to_frames(figs):
     frames = []
@@ -54,3 +74,112 @@ def figs_to_frames(figs):
         
     # Return frames
     return frames
+
+
+# Render a single timestamp to a video frame with plotly
+def plotly_frame(trajectories, teams, roles, t):
+    fig = plot_figure(trajectories, teams, roles.roles_at(t), t)
+    return imageio.v2.imread(pio.to_image(fig, format="png"))
+
+
+# Game data of the worker processes, set once by the pool initializer so it
+# is not sent along with every chunk
+_worker_game = None
+
+
+def _init_worker(render_frame, trajectories, teams, roles):
+    global _worker_game
+    _worker_game = (render_frame, trajectories, teams, roles)
+
+
+def _render_chunk(times):
+    render_frame, trajectories, teams, roles = _worker_game
+    return [render_frame(trajectories, teams, roles, t) for t in times]
+
+
+# Path of the part of the video rendered from start_frame on
+def segment_path(path, start_frame):
+    root, extension = os.path.splitext(path)
+    return f"{root}.part{start_frame:06d}{extension}"
+
+
+# Start frames and paths of the parts of an interrupted render of path
+def find_segments(path):
+    root, extension = os.path.splitext(path)
+    prefix = os.path.basename(root) + ".part"
+    segments = []
+    for name in os.listdir(os.path.dirname(os.path.abspath(path))):
+        number = name[len(prefix):len(name) - len(extension)]
+        if name.startswith(prefix) and name.endswith(extension) and number.isdigit():
+            segments.append((int(number), os.path.join(os.path.dirname(path), name)))
+    return sorted(segments)
+
+
+# Join the parts into path, every part up to the start of the next one. The
+# frames an interrupted run wrote past the resumed start_frame are rendered
+# again by the next run. The parts are decoded and encoded again, cutting
+# them with ffmpeg's concat demuxer is not exact to the frame.
+def concat_segments(segments, path, fps):
+    with imageio.v2.get_writer(path, fps=fps) as writer:
+        for (start, segment), (next_start, _) in zip(segments, segments[1:] + [(None, None)]):
+            with imageio.v2.get_reader(segment) as reader:
+                for index, frame in enumerate(reader):
+                    if next_start is not None and index >= next_start - start:
+                        break
+                    writer.append_data(frame)
+    for _, segment in segments:
+        os.remove(segment)
+
+
+# Render the video with a process pool and stream the frames into the writer
+# in order. Only a few chunks of frames are in flight at any time, so memory
+# does not grow with the video length. Every run writes its own part next to
+# path, which is only written once the last frame is done. An interrupted
+# render is resumed with start_frame (the frame number shown by the progress
+# bar), the parts are then joined into path. render_frame(trajectories,
+# teams, roles, t) gets the RoleTimeline of the game. df is the
+# interpol.parquet dataframe or a Trajectories, a memory-mapped one from
+# Trajectories.open is passed to the workers by path.
+def render_video(df, teams, initial_hunter, caught_timestamps, path, step=5, fps=30, jobs=None, chunk_size=8, start_frame=0, hold_last_frame=60, render_frame=plotly_frame):
+    jobs = jobs or os.cpu_count()
+    trajectories = as_trajectories(df)
+    times = trajectories.time[::step]
+    roles = RoleTimeline(teams, caught_timestamps, initial_hunter)
+    # parts of an earlier render before start_frame are kept, the rest is
+    # rendered again
+    segments = [(start, segment) for start, segment in find_segments(path) if start < start_frame]
+    if start_frame > 0 and not segments:
+        raise ValueError(f"no part of {path} before frame {start_frame} to resume from")
+    for start, segment in find_segments(path):
+        if start >= start_frame:
+            os.remove(segment)
+    chunks = (times[i:i + chunk_size] for i in range(start_frame, len(times), chunk_size))
+    pending = deque()
+    frame = None
+    with (
+        ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(render_frame, trajectories, teams, roles)) as executor,
+        imageio.v2.get_writer(segment_path(path, start_frame), fps=fps) as writer,
+        tqdm(total=len(times), initial=start_frame) as progress,
+    ):
+        for chunk in chunks:
+            pending.append(executor.submit(_render_chunk, chunk))
+            if len(pending) < 2 * jobs:
+                continue
+            for frame in pending.popleft().result():
+                writer.append_data(frame)
+                progress.update()
+        while pending:
+            for frame in pending.popleft().result():
+                writer.append_data(frame)
+                progress.update()
+
+        # repeat last frame
+        if frame is not None:
+            for _ in range(hold_last_frame):
+                writer.append_data(frame)
+
+    segments.append((start_frame, segment_path(path, start_frame)))
+    if len(segments) == 1:
+        os.replace(segments[0][1], path)
+    else:
+        concat_segments(segments, path, fps)
@@ -1,10 +1,46 @@
-const loadJson = (dir) => {
-    return Promise.all(["interpol", "team_caught", "team_names", "interesting_timestamps"].map(url => `${dir}/${url}.json`).map(url => {
-        return fetch(url).then(res => res.json());
+const loadJson = (dir, withInterpol = true) => {
+    const names = ["interpol", "team_caught", "team_names", "interesting_timestamps"];
+    return Promise.all(names.map(name => {
+        if (name === "interpol" && !withInterpol) {
+            return null;
+        }
+        return fetch(`${dir}/${name}.json`).then(res => res.json());
     }))
 }
 
+// index.json of the track pyramid written by conversion/track_pyramid.py,
+// null if the game directory has none
+const loadPyramidIndex = async (dir) => {
+    try {
+        const res = await fetch(`${dir}/pyramid/index.json`);
+        return res.ok ? await res.json() : null;
+    } catch {
+        return null;
+    }
+}
+
+const parseColumnarStatusUpdate = json => {
+    const byUser = {};
+    for (const [userId, columns] of Object.entries(json.teams)) {
+        byUser[userId] = columns.time.map((time, index) => ({
+            lat: columns.lat[index],
+            lon: columns.lon[index],
+            time,
+            gameState: columns.game_state[index],
+            isConnectionActive: columns.is_connection_active[index],
+            isInterpolated: columns.is_interpolated?.[index],
+        }));
+    }
+    for (const array of Object.values(byUser)) {
+        array.sort((a, b) => a.time - b.time);
+    }
+    return byUser;
+}
+
 const parseStatusUpdate = json => {
+    if (!Array.isArray(json)) {
+        return parseColumnarStatusUpdate(json);
+    }
     const byUser = {};
     for (const entry of json) {
         const userId = entry.active_user
@@ -26,16 +62,25 @@ const parseStatusUpdate = json => {
     return byUser;
 }
 
-const getLocationByTime = (locations, time) => {
-    let matchIndex = null;
-    for (const [index, entry] of locations.entries()) {
-        if (time < entry.time) {
-            matchIndex = index;
-            break;
+// index of the first element for which time < getTime(index), or length
+const upperBound = (length, time, getTime) => {
+    let low = 0;
+    let high = length;
+    while (low < high) {
+        const middle = (low + high) >> 1;
+        if (time < getTime(middle)) {
+            high = middle;
+        } else {
+            low = middle + 1;
         }
     }
+    return low;
+}
+
+const getLocationByTime = (locations, time) => {
+    const matchIndex = upperBound(locations.length, time, index => locations[index].time);
     let entry;
-    if (matchIndex === null) {
+    if (matchIndex === locations.length) {
         entry = locations[locations.length - 1];
     } else if (matchIndex === 0) {
         entry = locations[0]
@@ -53,6 +98,127 @@ const getLocationByTime = (locations, time) => {
     return entry;
 }
 
+// users, meta and pings from the window api of conversion/serve_maptalks.py,
+// null if the viewer is served without it
+const loadServerInfo = async (dir) => {
+    try {
+        const res = await fetch(`api/${dir}/meta`);
+        return res.ok ? await res.json() : null;
+    } catch {
+        return null;
+    }
+}
+
+// All locations of a game, loaded from interpol.json at once
+const createFullTracks = (locations) => ({
+    users: Object.keys(locations),
+    meta: getMeta(locations),
+    pings: null,
+    locations,
+    locationAt: (userId, time) => getLocationByTime(locations[userId], time),
+    preload: async () => {},
+})
+
+// Locations loaded chunk by chunk from the track pyramid. Faster playback
+// uses coarser levels. A chunk that is still loading is replaced by any
+// loaded chunk of another level, locationAt returns null if there is none.
+const createTrackPyramid = (dir, index) => {
+    const chunks = new Map();
+    const load = chunk => {
+        if (!chunks.has(chunk.path)) {
+            const promise = fetch(`${dir}/pyramid/${chunk.path}`)
+                .then(res => res.json())
+                .then(json => {
+                    chunks.set(chunk.path, parseColumnarStatusUpdate(json));
+                });
+            chunks.set(chunk.path, promise);
+        }
+        return chunks.get(chunk.path);
+    };
+    const isLoaded = chunk => chunks.has(chunk.path) && !(chunks.get(chunk.path) instanceof Promise);
+    const findChunkIndex = (level, time) => {
+        const chunkIndex = upperBound(level.chunks.length, time, i => level.chunks[i].start) - 1;
+        return Math.min(Math.max(chunkIndex, 0), level.chunks.length - 1);
+    };
+    const levelForSpeed = speed => {
+        let result = index.levels[0];
+        for (const level of index.levels) {
+            if (level.min_speed <= speed) {
+                result = level;
+            }
+        }
+        return result;
+    };
+    return {
+        users: index.users,
+        meta: index.meta,
+        pings: index.pings,
+        locationAt: (userId, time, speed = 0) => {
+            const preferred = levelForSpeed(speed);
+            const chunkIndex = findChunkIndex(preferred, time);
+            const chunk = preferred.chunks[chunkIndex];
+            load(chunk);
+            // fetch the next chunk before playback reaches it
+            if (chunkIndex + 1 < preferred.chunks.length && time > (chunk.start + chunk.end) / 2) {
+                load(preferred.chunks[chunkIndex + 1]);
+            }
+            for (const level of [preferred, ...index.levels]) {
+                const candidate = level.chunks[findChunkIndex(level, time)];
+                if (isLoaded(candidate) && userId in chunks.get(candidate.path)) {
+                    return getLocationByTime(chunks.get(candidate.path)[userId], time);
+                }
+            }
+            return null;
+        },
+        // loads the chunks of all levels around time
+        preload: async time => {
+            await Promise.all(index.levels.map(level => load(level.chunks[findChunkIndex(level, time)])));
+        },
+    }
+}
+
+// Locations streamed from the window api in windows of streamWindow
+// milliseconds. Playback can start after the first window, the following
+// ones are appended in the background.
+const streamWindow = 10 * 60 * 1000;
+const createStreamedTracks = (dir, info) => {
+    const locations = Object.fromEntries(info.users.map(user => [user, []]));
+    const fetchWindow = async start => {
+        const res = await fetch(`api/${dir}/window?t0=${start}&t1=${start + streamWindow}`);
+        const byUser = parseColumnarStatusUpdate(await res.json());
+        for (const [user, windowLocations] of Object.entries(byUser)) {
+            // windows overlap by the points around their borders
+            const array = locations[user];
+            const lastTime = array.length > 0 ? array[array.length - 1].time : -Infinity;
+            for (const location of windowLocations) {
+                if (location.time > lastTime) {
+                    array.push(location);
+                }
+            }
+        }
+    };
+    let firstWindow = null;
+    const streamRest = async () => {
+        for (let start = info.meta.minTime + streamWindow; start <= info.meta.maxTime; start += streamWindow) {
+            await fetchWindow(start);
+        }
+    };
+    return {
+        users: info.users,
+        meta: info.meta,
+        pings: info.pings,
+        locations,
+        locationAt: (userId, time) => locations[userId].length > 0 ? getLocationByTime(locations[userId], time) : null,
+        preload: async () => {
+            if (firstWindow === null) {
+                firstWindow = fetchWindow(info.meta.minTime);
+                firstWindow.then(streamRest);
+            }
+            await firstWindow;
+        },
+    }
+}
+
 const getCatchTimeStamp = (isoTime) => {
     if (!isoTime.includes("+")) {
         isoTime += "Z"
@@ -193,12 +359,22 @@ const downloadBlob = (blob, filename) => {
 
 const run = async (directory) => {
     document.querySelector("#title").innerHTML = `<strong>${directory}</strong> <small>(press "c" to change)</small>`;
-    const [statusUpdate, teamCaught, teamNames, interestingTimestamps] = await loadJson(directory);
-
-    const locations = parseStatusUpdate(statusUpdate)
-    const meta = getMeta(locations);
+    const pyramidIndex = await loadPyramidIndex(directory);
+    const serverInfo = pyramidIndex === null ? await loadServerInfo(directory) : null;
+    const [statusUpdate, teamCaught, teamNames, interestingTimestamps] = await loadJson(directory, pyramidIndex === null && serverInfo === null);
+
+    let tracks;
+    if (pyramidIndex !== null) {
+        tracks = createTrackPyramid(directory, pyramidIndex);
+    } else if (serverInfo !== null) {
+        tracks = createStreamedTracks(directory, serverInfo);
+    } else {
+        tracks = createFullTracks(parseStatusUpdate(statusUpdate));
+    }
+    const meta = tracks.meta;
+    await tracks.preload(meta.minTime);
     const catchTimes = getCatchTimes(teamCaught, meta.minTime);
-    const pings = getPings(locations, meta, catchTimes);
+    const pings = tracks.pings ?? getPings(tracks.locations, meta, catchTimes);
 
     const timeSlider = document.querySelector("#time");
     timeSlider.min = meta.minTime;
@@ -285,8 +461,7 @@ const run = async (directory) => {
     console.log(catchTimes);
 
 
-    for (const [user, userLocations] of Object.entries(locations)) {
-        const location = getLocationByTime(userLocations, time);
+    for (const user of tracks.users) {
         markers[user] = new maptalks.Marker(c, {
             properties: {
                 name: teamNames[user],
@@ -296,7 +471,7 @@ const run = async (directory) => {
     }
 
     const pingMarkers = {}
-    for (const user of Object.keys(locations)) {
+    for (const user of tracks.users) {
         pingMarkers[user] = new maptalks.Marker(c, {
             symbol: symbolPing
         }).addTo(pingLayer);
@@ -310,7 +485,7 @@ const run = async (directory) => {
     const nTail = Math.floor(tailDuration / tailStepSize);
 
     const tailMarkers = {}
-    for (const user of Object.keys(locations)) {
+    for (const user of tracks.users) {
         tailMarkers[user] = []
         for (let i = 0; i < nTail; i++) {
             const marker = new maptalks.Marker(c.add(i * 0.0002, 0), { symbol: symbolTail }).addTo(tailLayer);
@@ -321,7 +496,10 @@ const run = async (directory) => {
     }
 
     const updateMarker = (marker, userId, time, tailMarker) => {
-        const location = getLocationByTime(locations[userId], time);
+        const location = tracks.locationAt(userId, time, speedFactor);
+        if (location === null) {
+            return;
+        }
         marker.setCoordinates(new maptalks.Coordinate(location.lon, location.lat));
         const isChaser = userId in catchTimes && time >= catchTimes[userId];
         const isGrey =